@@ -0,0 +1,207 @@
+"""
+Caches for the API proxy's auth path: verified Firebase ID tokens, the
+backend's Google ID token and the email whitelist.
+
+All classes are thread-safe and take their verifier/fetcher and clock as
+arguments, so they can be exercised with local fakes.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class VerifiedTokenCache:
+    """
+    Remembers the claims of recently verified ID tokens.
+
+    An entry lives for at most ``ttl_seconds`` and never past the token's
+    own ``exp`` claim. Failed verifications raise and are not cached.
+    """
+
+    def __init__(
+        self,
+        verify: Callable[[str], dict],
+        ttl_seconds: float = 300,
+        max_entries: int = 10_000,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.verify = verify
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        # Keep digests rather than bearer tokens in memory
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def lookup(self, token: str) -> dict | None:
+        """Return cached claims for ``token`` without verifying, or None."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if self.clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def get(self, token: str) -> dict:
+        """Return the claims for ``token``, verifying it on a cache miss (blocking)."""
+        claims = self.lookup(token)
+        if claims is not None:
+            return claims
+
+        claims = self.verify(token)
+        now = self.clock()
+        expires_at = now + self.ttl_seconds
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        if expires_at > now:
+            with self._lock:
+                self._entries[self._key(token)] = (expires_at, claims)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return claims
+
+
+def jwt_expiry(token: str) -> float | None:
+    """Read the ``exp`` claim of a JWT without verifying its signature."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class RefreshingToken:
+    """
+    Holds one fetched token and refetches it ``refresh_margin`` seconds
+    before it expires. The expiry comes from the token's ``exp`` claim,
+    falling back to ``default_ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], str],
+        refresh_margin: float = 300,
+        default_ttl: float = 3600,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self._token: str | None = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def fresh(self) -> str | None:
+        """Return the token if it is not due for refresh, without blocking."""
+        if self._token and self.clock() < self._expires_at - self.refresh_margin:
+            return self._token
+        return None
+
+    def get(self) -> str:
+        """Return a valid token, fetching a new one when due (blocking)."""
+        token = self.fresh()
+        if token:
+            return token
+        with self._lock:
+            # Another thread may have refreshed it while we waited
+            token = self.fresh()
+            if token:
+                return token
+            token = self.fetch()
+            expiry = jwt_expiry(token)
+            self._token = token
+            self._expires_at = expiry if expiry is not None else self.clock() + self.default_ttl
+            return token
+
+
+_MISSING = -1.0
+
+
+def parse_whitelist(text: str) -> set[str]:
+    emails = set()
+    for line in text.splitlines():
+        line = line.strip()
+        # Skip empty lines and comments
+        if line and not line.startswith("#"):
+            emails.add(line.lower())
+    return emails
+
+
+class Whitelist:
+    """
+    Email whitelist read from a file and reloaded when its mtime changes.
+
+    The file is stat'ed at most every ``check_interval`` seconds. Only the
+    initial load may come up empty (no file, or no entries); once users
+    have been loaded, a file that goes missing, cannot be read or parses
+    empty keeps the last good set instead of opening access to everyone.
+    """
+
+    def __init__(self, path: Path, check_interval: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self.clock = clock
+        self._emails: set[str] = set()
+        self._mtime: float | None = None
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+        self.reload_if_changed()
+
+    def reload_if_changed(self) -> None:
+        with self._lock:
+            now = self.clock()
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                if self._mtime != _MISSING:
+                    self._mtime = _MISSING
+                    self._keep_last_good("not found")
+                return
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                emails = parse_whitelist(self.path.read_text())
+            except (OSError, UnicodeDecodeError) as exc:
+                self._keep_last_good(f"could not be read ({exc})")
+                return
+            if not emails and self._emails:
+                self._keep_last_good("is empty")
+                return
+            self._emails = emails
+            logger.info(f"Loaded {len(self._emails)} users from whitelist")
+
+    def _keep_last_good(self, problem: str) -> None:
+        if self._emails:
+            logger.warning(f"Whitelist file {self.path} {problem}; keeping the last {len(self._emails)} users")
+        else:
+            logger.warning(f"Whitelist file {self.path} {problem}")
+
+    @property
+    def emails(self) -> set[str]:
+        self.reload_if_changed()
+        return self._emails
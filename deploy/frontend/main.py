@@ -4,17 +4,23 @@ Handles /api/* requests from Firebase Hosting and proxies to the backend.
 Uses Firebase Auth for user authentication and a whitelist for access control.
 """
 
+import asyncio
 import os
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
 import google.auth.transport.requests
 import google.oauth2.id_token
 import firebase_admin
 from firebase_admin import auth as firebase_auth
 
+from auth_cache import RefreshingToken, VerifiedTokenCache, Whitelist
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -27,10 +33,52 @@ BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
 # Firebase project ID (required for token verification)
 FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
 
-app = FastAPI(title="Lyre Studio API Proxy")
+# Connection pool to the backend, shared by all requests
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_MAX_KEEPALIVE = int(os.getenv("BACKEND_MAX_KEEPALIVE", "20"))
+BACKEND_KEEPALIVE_SECONDS = float(os.getenv("BACKEND_KEEPALIVE_SECONDS", "60"))
+BACKEND_TIMEOUT = httpx.Timeout(300.0, connect=10.0)
+
+# Request headers passed through to the backend
+# (x-profile opts a request into backend profiling)
+FORWARDED_REQUEST_HEADERS = ("content-type", "content-length", "accept", "accept-encoding", "x-profile")
+
+# Connection-scoped headers that must not be forwarded by a proxy (RFC 9110)
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.backend = httpx.AsyncClient(
+        timeout=BACKEND_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=BACKEND_MAX_CONNECTIONS,
+            max_keepalive_connections=BACKEND_MAX_KEEPALIVE,
+            keepalive_expiry=BACKEND_KEEPALIVE_SECONDS,
+        ),
+    )
+    yield
+    await app.state.backend.aclose()
+
 
-# Whitelist file path
-WHITELIST_FILE = Path(__file__).parent / "allowed_users.txt"
+app = FastAPI(title="Lyre Studio API Proxy", lifespan=lifespan)
+
+# Whitelist file path; reloaded when it changes, so it can live on a mounted volume
+WHITELIST_FILE = Path(os.getenv("WHITELIST_FILE", Path(__file__).parent / "allowed_users.txt"))
+
+# How long a verified Firebase token is trusted before re-verifying (capped by its exp)
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+# Refresh the backend ID token this long before it expires
+BACKEND_TOKEN_REFRESH_SECONDS = float(os.getenv("BACKEND_TOKEN_REFRESH_SECONDS", "300"))
 
 # Initialize Firebase Admin SDK (only if project ID is set)
 _firebase_initialized = False
@@ -43,31 +91,27 @@ if FIREBASE_PROJECT_ID:
         logger.warning(f"Failed to initialize Firebase Admin: {e}")
 
 
-def load_whitelist() -> set[str]:
-    """Load allowed emails from whitelist file."""
-    if not WHITELIST_FILE.exists():
-        logger.warning(f"Whitelist file not found: {WHITELIST_FILE}")
-        return set()
-    
-    emails = set()
-    with open(WHITELIST_FILE) as f:
-        for line in f:
-            line = line.strip()
-            # Skip empty lines and comments
-            if line and not line.startswith("#"):
-                emails.add(line.lower())
-    return emails
+whitelist = Whitelist(WHITELIST_FILE)
+
+verified_tokens = VerifiedTokenCache(
+    lambda token: firebase_auth.verify_id_token(token),
+    ttl_seconds=AUTH_CACHE_TTL_SECONDS,
+)
 
 
-# Load whitelist at startup
-ALLOWED_USERS = load_whitelist()
-logger.info(f"Loaded {len(ALLOWED_USERS)} users from whitelist")
+def _fetch_backend_token() -> str:
+    auth_req = google.auth.transport.requests.Request()
+    return google.oauth2.id_token.fetch_id_token(auth_req, BACKEND_URL)
 
 
-def verify_firebase_token(request: Request) -> str | None:
+backend_token = RefreshingToken(_fetch_backend_token, refresh_margin=BACKEND_TOKEN_REFRESH_SECONDS)
+
+
+async def verify_firebase_token(request: Request) -> str | None:
     """
     Verify Firebase ID token from Authorization header.
     Returns the user's email if valid, None otherwise.
+    Verified tokens are cached; cache misses verify off the event loop.
     """
     auth_header = request.headers.get("Authorization", "")
     
@@ -80,33 +124,37 @@ def verify_firebase_token(request: Request) -> str | None:
         logger.warning("Firebase not initialized, skipping token verification")
         return None
     
-    try:
-        decoded_token = firebase_auth.verify_id_token(token)
-        email = decoded_token.get("email", "")
-        return email
-    except Exception as e:
-        logger.warning(f"Token verification failed: {e}")
-        return None
+    decoded_token = verified_tokens.lookup(token)
+    if decoded_token is None:
+        try:
+            decoded_token = await asyncio.to_thread(verified_tokens.get, token)
+        except Exception as e:
+            logger.warning(f"Token verification failed: {e}")
+            return None
+    return decoded_token.get("email", "")
 
 
 def check_whitelist(email: str) -> bool:
     """Check if email is in the whitelist."""
-    if not ALLOWED_USERS:
+    allowed_users = whitelist.emails
+    if not allowed_users:
         # If whitelist is empty, allow all authenticated users
         logger.warning("Whitelist is empty - allowing all authenticated users")
         return True
-    return email.lower() in ALLOWED_USERS
+    return email.lower() in allowed_users
 
 
-def get_backend_auth_token() -> str | None:
+async def get_backend_auth_token() -> str | None:
     """Get Google ID token for service-to-service auth with backend."""
     if "localhost" in BACKEND_URL:
         return None  # No auth needed for local development
     
-    try:
-        auth_req = google.auth.transport.requests.Request()
-        token = google.oauth2.id_token.fetch_id_token(auth_req, BACKEND_URL)
+    # Reuse the cached token; fetch off the event loop when it is due for refresh
+    token = backend_token.fresh()
+    if token:
         return token
+    try:
+        return await asyncio.to_thread(backend_token.get)
     except Exception as e:
         logger.warning(f"Failed to get backend auth token: {e}")
         return None
@@ -124,7 +172,7 @@ async def auth_check(request: Request):
     Check if the authenticated user is authorized (in whitelist).
     Called by frontend after Firebase login to determine if user can access the app.
     """
-    user_email = verify_firebase_token(request)
+    user_email = await verify_firebase_token(request)
     
     if not user_email:
         return {"authorized": False, "reason": "Not authenticated"}
@@ -142,7 +190,7 @@ async def proxy_to_backend(path: str, request: Request) -> Response:
     """Proxy all /api/* requests to the backend service with auth."""
     
     # Verify Firebase token and check whitelist
-    user_email = verify_firebase_token(request)
+    user_email = await verify_firebase_token(request)
     
     if not user_email:
         logger.warning(f"Unauthorized API request: /api/{path}")
@@ -154,48 +202,51 @@ async def proxy_to_backend(path: str, request: Request) -> Response:
     
     logger.info(f"API: {request.method} /api/{path} - user: {user_email}")
     
-    # Build headers for backend request
-    headers = {}
-    # Forward content-type for file uploads
-    if "content-type" in request.headers:
-        headers["content-type"] = request.headers["content-type"]
+    # Build headers for backend request (content-type/length for file uploads)
+    headers = {
+        name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers
+    }
     
     # Add service-to-service auth token for backend
-    backend_token = get_backend_auth_token()
-    if backend_token:
-        headers["Authorization"] = f"Bearer {backend_token}"
+    auth_token = await get_backend_auth_token()
+    if auth_token:
+        headers["Authorization"] = f"Bearer {auth_token}"
     
-    # Get request body
-    body = await request.body()
+    # Stream the upload through instead of buffering it; the body is sent
+    # chunked unless the client gave a content-length
+    client: httpx.AsyncClient = request.app.state.backend
+    backend_request = client.build_request(
+        method=request.method,
+        url=f"{BACKEND_URL}/api/{path}",
+        headers=headers,
+        content=request.stream(),
+        params=request.query_params,
+    )
+    try:
+        response = await client.send(backend_request, stream=True)
+    except httpx.RequestError as e:
+        logger.error(f"Backend request failed: {e} - user: {user_email}")
+        return Response(
+            content=f"Backend unavailable: {e}",
+            status_code=502,
+        )
     
-    # Forward the request
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        try:
-            response = await client.request(
-                method=request.method,
-                url=f"{BACKEND_URL}/api/{path}",
-                headers=headers,
-                content=body,
-                params=request.query_params,
-            )
-            
-            # Log significant operations
-            if path in ("synthesize", "translate"):
-                logger.info(f"Completed: {path} - user: {user_email} - status: {response.status_code}")
-            
-            # Return the response, preserving headers
-            return Response(
-                content=response.content,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.headers.get("content-type"),
-            )
-        except httpx.RequestError as e:
-            logger.error(f"Backend request failed: {e} - user: {user_email}")
-            return Response(
-                content=f"Backend unavailable: {e}",
-                status_code=502,
-            )
+    # Log significant operations
+    if path in ("synthesize", "translate"):
+        logger.info(f"Completed: {path} - user: {user_email} - status: {response.status_code}")
+    
+    # Relay the body as it arrives, still encoded, so streamed responses
+    # reach the client early and proxy memory stays constant
+    relayed = StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        background=BackgroundTask(response.aclose),
+    )
+    # Appended one by one so repeated headers such as Set-Cookie survive
+    for name, value in response.headers.multi_items():
+        if name.lower() not in HOP_BY_HOP_HEADERS:
+            relayed.headers.append(name, value)
+    return relayed
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+import base64
+import json
+import os
+
+import pytest
+
+from auth_cache import RefreshingToken, VerifiedTokenCache, Whitelist
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_jwt(exp: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).rstrip(b"=").decode()
+    return f"header.{payload}.signature"
+
+
+def counting_verifier(claims: dict):
+    calls = []
+
+    def verify(token: str) -> dict:
+        calls.append(token)
+        return dict(claims)
+
+    return verify, calls
+
+
+def test_verified_token_is_cached_until_ttl():
+    clock = FakeClock()
+    verify, calls = counting_verifier({"email": "a@example.com"})
+    cache = VerifiedTokenCache(verify, ttl_seconds=60, clock=clock)
+
+    assert cache.get("token")["email"] == "a@example.com"
+    clock.now += 59
+    assert cache.get("token")["email"] == "a@example.com"
+    assert len(calls) == 1
+
+    clock.now += 1
+    assert cache.lookup("token") is None
+    cache.get("token")
+    assert len(calls) == 2
+
+
+def test_verified_token_expires_with_its_exp_claim():
+    clock = FakeClock()
+    verify, calls = counting_verifier({"email": "a@example.com", "exp": clock.now + 10})
+    cache = VerifiedTokenCache(verify, ttl_seconds=300, clock=clock)
+
+    cache.get("token")
+    clock.now += 9
+    assert cache.lookup("token") is not None
+    clock.now += 1
+    assert cache.lookup("token") is None
+
+
+def test_failed_verification_is_not_cached():
+    attempts = []
+
+    def verify(token: str) -> dict:
+        attempts.append(token)
+        raise ValueError("bad signature")
+
+    cache = VerifiedTokenCache(verify, clock=FakeClock())
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get("token")
+    assert len(attempts) == 2
+
+
+def test_verified_token_cache_evicts_least_recently_used():
+    verify, _ = counting_verifier({"email": "a@example.com"})
+    cache = VerifiedTokenCache(verify, max_entries=2, clock=FakeClock())
+
+    cache.get("a")
+    cache.get("b")
+    cache.lookup("a")
+    cache.get("c")
+
+    assert cache.lookup("a") is not None
+    assert cache.lookup("b") is None
+
+
+def test_refreshing_token_refetches_before_expiry():
+    clock = FakeClock()
+    fetched = []
+
+    def fetch() -> str:
+        fetched.append(make_jwt(clock.now + 3600))
+        return fetched[-1]
+
+    token = RefreshingToken(fetch, refresh_margin=300, clock=clock)
+
+    first = token.get()
+    clock.now += 3600 - 301
+    assert token.get() == first
+    clock.now += 1
+    assert token.fresh() is None
+    second = token.get()
+
+    assert second != first and fetched == [first, second]
+
+
+def test_refreshing_token_without_exp_uses_default_ttl():
+    clock = FakeClock()
+    token = RefreshingToken(lambda: "opaque-token", refresh_margin=60, default_ttl=600, clock=clock)
+
+    token.get()
+    clock.now += 539
+    assert token.fresh() == "opaque-token"
+    clock.now += 1
+    assert token.fresh() is None
+
+
+def write_whitelist(path, text: str, mtime: float) -> None:
+    path.write_text(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_whitelist_reloads_when_the_file_changes(tmp_path):
+    path = tmp_path / "allowed_users.txt"
+    write_whitelist(path, "# admins\nA@example.com\n\n", mtime=1)
+    clock = FakeClock()
+    whitelist = Whitelist(path, check_interval=5, clock=clock)
+    assert whitelist.emails == {"a@example.com"}
+
+    write_whitelist(path, "a@example.com\nb@example.com\n", mtime=2)
+    clock.now += 4
+    assert whitelist.emails == {"a@example.com"}
+    clock.now += 1
+    assert whitelist.emails == {"a@example.com", "b@example.com"}
+
+
+@pytest.mark.parametrize("problem", ["empty", "missing", "unreadable"])
+def test_whitelist_keeps_last_good_list_on_failed_reload(tmp_path, problem):
+    path = tmp_path / "allowed_users.txt"
+    write_whitelist(path, "a@example.com\n", mtime=1)
+    clock = FakeClock()
+    whitelist = Whitelist(path, check_interval=0, clock=clock)
+
+    if problem == "empty":
+        write_whitelist(path, "# nobody\n", mtime=2)
+    elif problem == "missing":
+        path.unlink()
+    else:
+        path.write_bytes(b"\xff\xfe\xfa")
+        os.utime(path, (2, 2))
+    clock.now += 1
+
+    assert whitelist.emails == {"a@example.com"}
+
+
+def test_whitelist_starts_empty_without_a_file(tmp_path):
+    whitelist = Whitelist(tmp_path / "missing.txt", clock=FakeClock())
+
+    assert whitelist.emails == set()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for each stage of the backend audio path.
+
+Stages: upload decode, load_audio resampling, Seamless processor and
+generate, Chatterbox generate, build_pedalboard, apply_effects and WAV
+encode. By default ("auto") the real models are used when they are
+already in the Hugging Face cache; otherwise lightweight stub models stand
+in, so the suite runs offline on CPU. Stub timings only track the code
+around the models, not model speed.
+
+Results are written as JSON. Pass --baseline with an earlier result to flag
+stages whose median slowed down by more than --threshold; the exit code is
+1 when any stage regressed.
+
+Usage (from the repo root):
+    uv run python scripts/benchmark_stages.py --output bench.json
+    uv run python scripts/benchmark_stages.py --baseline bench.json --threshold 0.15
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_DIR / "src" / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import numpy as np
+import torch
+
+from voice_services import audio_handler, realtime_effects
+
+SEAMLESS_REPO = "facebook/seamless-m4t-v2-large"
+CHATTERBOX_REPO = "ResembleAI/chatterbox"
+SEAMLESS_SR = 16000
+CHATTERBOX_SR = 24000
+
+EFFECTS_CONFIG = {
+    "noise_gate": {},
+    "compressor": {},
+    "highpass": {},
+    "lowpass": {},
+    "reverb": {},
+}
+SYNTH_TEXT = "Bonjour, ceci est un petit test de synthèse vocale."
+
+
+class StubProcessor:
+    """Stands in for the Seamless processor: fbank features plus padding."""
+
+    def __call__(self, audio, sampling_rate, padding=True, return_tensors="pt"):
+        feats = [
+            torch.nn.functional.pad(
+                torch.from_numpy(np.asarray(a, dtype=np.float32)).unsqueeze(0), (0, 400)
+            )
+            for a in audio
+        ]
+        feats = [
+            torch.stft(f, n_fft=400, hop_length=160, return_complex=True).abs().squeeze(0).T[:, :80]
+            for f in feats
+        ]
+        lengths = [f.shape[0] for f in feats]
+        batch = torch.nn.utils.rnn.pad_sequence(feats, batch_first=True)
+        mask = torch.arange(batch.shape[1])[None, :] < torch.tensor(lengths)[:, None]
+        return {"input_features": batch, "attention_mask": mask.long()}
+
+    def batch_decode(self, tokens, skip_special_tokens=True):
+        return [" ".join(str(int(t)) for t in row) for row in tokens]
+
+
+class StubSeamless(torch.nn.Module):
+    """Tiny encoder plus a fixed number of greedy decode steps."""
+
+    def __init__(self, dim: int = 80, steps: int = 32):
+        super().__init__()
+        layer = torch.nn.TransformerEncoderLayer(dim, nhead=4, dim_feedforward=256, batch_first=True)
+        self.encoder = torch.nn.TransformerEncoder(layer, num_layers=2)
+        self.head = torch.nn.Linear(dim, 1000)
+        self.steps = steps
+
+    @torch.no_grad()
+    def generate(self, input_features, attention_mask, tgt_lang):
+        hidden = self.encoder(input_features, src_key_padding_mask=attention_mask == 0)
+        state = hidden.mean(dim=1)
+        tokens = []
+        for _ in range(self.steps):
+            logits = self.head(state)
+            tokens.append(logits.argmax(dim=-1))
+            state = state + 0.01 * torch.tanh(logits[:, : state.shape[1]])
+        return torch.stack(tokens, dim=1)
+
+
+class StubChatterbox:
+    """Produces a waveform whose length scales with the text, like Chatterbox."""
+
+    sr = CHATTERBOX_SR
+
+    def __init__(self):
+        self.proj = torch.nn.Linear(256, 256)
+
+    @torch.no_grad()
+    def generate(self, text, language_id=None, exaggeration=0.5, cfg_weight=0.5):
+        frames = 4 * len(text)
+        state = torch.zeros(1, 256)
+        for _ in range(frames):
+            state = torch.tanh(self.proj(state))
+        samples = int(len(text) * 0.06 * self.sr)
+        t = torch.arange(samples) / self.sr
+        return (0.1 * torch.sin(2 * torch.pi * 220 * t)).unsqueeze(0)
+
+
+def real_models_cached() -> bool:
+    try:
+        from huggingface_hub import scan_cache_dir
+
+        cached = {repo.repo_id for repo in scan_cache_dir().repos}
+    except Exception:
+        return False
+    return SEAMLESS_REPO in cached and CHATTERBOX_REPO in cached
+
+
+def load_backend(name: str, reference_wav: bytes):
+    """Return (processor, seamless, chatterbox) for the chosen backend."""
+    if name == "stub":
+        return StubProcessor(), StubSeamless().eval(), StubChatterbox()
+
+    from api.state import get_state
+
+    state = get_state()
+    state.load_models()
+    with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
+        tmp.write(reference_wav)
+        tmp.flush()
+        state.chatterbox.prepare_conditionals(tmp.name, exaggeration=0.5)
+    return state.seamless_processor, state.seamless_model, state.chatterbox
+
+
+def synthetic_clip(seconds: float, sr: int = 44100) -> np.ndarray:
+    """Deterministic stereo speech-like signal: modulated harmonics plus noise."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sr)) / sr
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 560)))
+    mono = 0.2 * envelope * voice + 0.01 * rng.standard_normal(len(t))
+    return np.stack([mono, 0.9 * mono]).astype(np.float32)
+
+
+def measure(fn: Callable[[], object], warmup: int, repeats: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times: List[float] = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    times.sort()
+    return {
+        "median_ms": statistics.median(times),
+        "mean_ms": statistics.fmean(times),
+        "min_ms": times[0],
+        "p90_ms": times[min(len(times) - 1, int(0.9 * len(times)))],
+        "repeats": repeats,
+    }
+
+
+def run_stages(args: argparse.Namespace, backend: str) -> Dict[str, Dict[str, float]]:
+    if args.audio:
+        upload = Path(args.audio).read_bytes()
+    else:
+        upload = audio_handler.encode_wav(synthetic_clip(args.seconds), 44100)
+
+    waveform, sr = audio_handler.decode_audio(upload)
+    clip_16k, _ = audio_handler.load_audio(upload, SEAMLESS_SR)
+    reference = audio_handler.prepare_audio(waveform, sr, (CHATTERBOX_SR,))[CHATTERBOX_SR]
+    processor, seamless, chatterbox = load_backend(backend, audio_handler.encode_wav(reference, CHATTERBOX_SR))
+    device = next(seamless.parameters()).device
+
+    def processor_call():
+        return processor(audio=[clip_16k], sampling_rate=SEAMLESS_SR, padding=True, return_tensors="pt")
+
+    inputs = {k: v.to(device) for k, v in processor_call().items()}
+    synthesized = chatterbox.generate(SYNTH_TEXT, language_id="fr").squeeze(0).cpu().numpy()
+
+    def seamless_generate():
+        with torch.no_grad():
+            return seamless.generate(**inputs, tgt_lang="fra")
+
+    stages = {
+        "decode": lambda: audio_handler.decode_audio(upload),
+        "load_audio": lambda: audio_handler.load_audio(upload, SEAMLESS_SR),
+        "seamless_processor": processor_call,
+        "seamless_generate": seamless_generate,
+        "chatterbox_generate": lambda: chatterbox.generate(SYNTH_TEXT, language_id="fr"),
+        # build_pedalboard constructs a fresh board; apply_effects uses the pool
+        "build_pedalboard": lambda: realtime_effects.build_pedalboard(EFFECTS_CONFIG),
+        "apply_effects": lambda: realtime_effects.apply_effects(synthesized, CHATTERBOX_SR, EFFECTS_CONFIG),
+        "encode_wav": lambda: audio_handler.encode_wav(synthesized, CHATTERBOX_SR),
+    }
+    model_stages = {"seamless_generate", "chatterbox_generate"}
+
+    results = {}
+    for name, fn in stages.items():
+        if args.stages and name not in args.stages:
+            continue
+        repeats = args.model_repeats if name in model_stages else args.repeats
+        results[name] = measure(fn, warmup=1, repeats=repeats)
+        print(f"{name:<22}{results[name]['median_ms']:>10.2f} ms", file=sys.stderr)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True)
+        return out.stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[str]:
+    """Return the stages whose median is more than ``threshold`` slower than the baseline."""
+    if current["meta"]["backend"] != baseline["meta"].get("backend"):
+        print("Warning: comparing runs from different backends", file=sys.stderr)
+    regressions = []
+    for name, stats in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before:
+            continue
+        change = stats["median_ms"] / before["median_ms"] - 1
+        stats["change"] = round(change, 4)
+        flag = "REGRESSION" if change > threshold else ""
+        print(f"{name:<22}{before['median_ms']:>10.2f} -> {stats['median_ms']:>10.2f} ms {change:+7.1%} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("auto", "stub", "real"), default="auto")
+    parser.add_argument("--audio", help="Input clip to benchmark with (default: synthetic 44.1kHz stereo)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of the synthetic clip")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--model-repeats", type=int, default=3, help="Repeats for model generate stages")
+    parser.add_argument("--stages", nargs="+", help="Only run these stages")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed median slowdown (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    backend = args.backend
+    if backend == "auto":
+        backend = "real" if real_models_cached() else "stub"
+    print(f"Benchmark backend: {backend}", file=sys.stderr)
+
+    result = {
+        "meta": {
+            "backend": backend,
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "cuda": torch.cuda.is_available(),
+        },
+        "stages": run_stages(args, backend),
+    }
+
+    regressions = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(result, baseline, args.threshold)
+        result["regressions"] = regressions
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2))
+    else:
+        print(json.dumps(result, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Compare CPU inference modes for latency and output quality.
+
+Each mode runs in a fresh subprocess with CPU_OPTIMIZATIONS set, so models
+are loaded exactly as the backend would load them. Translation output is
+compared to the baseline ("none") by text similarity; synthesis is
+compared by duration and real-time factor with a fixed seed.
+
+Usage (from the repo root):
+    uv run python scripts/compare_cpu_modes.py --audio clip.wav \\
+        --text "Hello there, how are you today?" --modes none int8 bf16
+"""
+
+import argparse
+import difflib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "src" / "backend"
+
+
+def run_worker(args: argparse.Namespace) -> dict:
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    # Repeats must measure generation, not the result cache
+    os.environ.pop("SYNTHESIS_CACHE_DIR", None)
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    from api.state import get_state, DEVICE
+    from voice_services import audio_handler, speech_synthesis, translation
+
+    if DEVICE != "cpu":
+        raise SystemExit(f"Expected a CPU-only run, got device {DEVICE}")
+
+    state = get_state()
+    t0 = time.perf_counter()
+    state.load_models()
+    load_seconds = time.perf_counter() - t0
+
+    raw = Path(args.audio).read_bytes()
+    prepared = audio_handler.decode_and_prepare(raw, (translation.SEAMLESS_SR, speech_synthesis.CHATTERBOX_SR))
+    clip = prepared[translation.SEAMLESS_SR].squeeze(0).numpy()
+    seamless_code = translation.config.get_seamless_code(args.language)
+
+    translate_times, texts = [], []
+    for _ in range(args.repeats):
+        t0 = time.perf_counter()
+        texts.append(translation.translate_batch([clip], seamless_code)[0])
+        translate_times.append(time.perf_counter() - t0)
+
+    voice_id = speech_synthesis.store_voice_reference(prepared[speech_synthesis.CHATTERBOX_SR])
+    synth_times, durations = [], []
+    for _ in range(args.repeats):
+        t0 = time.perf_counter()
+        data = speech_synthesis.synthesize_text(args.text, voice_id, args.language, 0.5, 0.6, seed=0)
+        synth_times.append(time.perf_counter() - t0)
+        waveform, sr = audio_handler.decode_audio(data)
+        durations.append(waveform.shape[-1] / sr)
+
+    return {
+        "load_seconds": load_seconds,
+        "translate_seconds": min(translate_times),
+        "translation": texts[0],
+        "synthesize_seconds": min(synth_times),
+        "audio_seconds": durations[0],
+        "real_time_factor": min(synth_times) / durations[0],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", required=True, help="Speech clip used for translation and as the voice")
+    parser.add_argument("--text", default="The quick brown fox jumps over the lazy dog.")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--modes", nargs="+", default=["none", "int8", "bf16"])
+    parser.add_argument("--repeats", type=int, default=2)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    results = {}
+    for mode in args.modes:
+        env = dict(os.environ, CPU_OPTIMIZATIONS="" if mode == "none" else mode)
+        cmd = [sys.executable, __file__, "--worker", "--audio", args.audio, "--text", args.text,
+               "--language", args.language, "--repeats", str(args.repeats)]
+        print(f"Running mode {mode}...", file=sys.stderr)
+        proc = subprocess.run(cmd, env=env, cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    baseline = results.get("none") or next(iter(results.values()))
+    print(f"{'mode':<16}{'load s':>9}{'translate s':>13}{'synth s':>9}{'RTF':>7}{'text sim':>10}")
+    for mode, r in results.items():
+        r["translation_similarity"] = difflib.SequenceMatcher(None, baseline["translation"], r["translation"]).ratio()
+        print(
+            f"{mode:<16}{r['load_seconds']:>9.1f}{r['translate_seconds']:>13.2f}"
+            f"{r['synthesize_seconds']:>9.2f}{r['real_time_factor']:>7.2f}{r['translation_similarity']:>10.3f}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
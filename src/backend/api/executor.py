@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from fastapi import HTTPException
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+_queue_position: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "queue_position", default=None
+)
+
+
+def current_queue_position() -> Optional[int]:
+    """Queue position assigned to the most recent job admitted in this request."""
+    return _queue_position.get()
+
+
+class InferenceExecutor:
+    """Runs blocking model calls on a dedicated thread pool.
+
+    At most ``max_concurrency`` jobs run at once and at most ``max_queue``
+    more may wait. Beyond that, new work is rejected with 429 and a
+    Retry-After estimate instead of piling up on the event loop.
+
+    Work that waits outside the pool, such as requests sitting in a
+    micro-batcher, holds slots through ``reserve``/``reservation`` so it
+    counts against the same limit; the batch jobs it turns into then run
+    with ``reserved=True`` and are not counted a second time.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 1, max_queue: int = 8):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"infer-{name}")
+        self._pending = 0
+        self._reserved = 0
+        self._avg_seconds = 10.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> int:
+        return self._pending + self._reserved
+
+    def _retry_after(self) -> int:
+        waves = (self._load() + 1) / self.max_concurrency
+        return max(1, math.ceil(waves * self._avg_seconds))
+
+    def check_capacity(self) -> None:
+        with self._lock:
+            if self._load() >= self.max_concurrency + self.max_queue:
+                self._reject()
+
+    def reserve(self, slots: int = 1) -> int:
+        """Hold ``slots`` request slots, or raise 429 if they do not fit; returns the queue position."""
+        with self._lock:
+            if self._load() + slots > self.max_concurrency + self.max_queue:
+                self._reject()
+            position = max(0, self._load() - self.max_concurrency + 1)
+            self._reserved += slots
+            return position
+
+    def release(self, slots: int = 1) -> None:
+        with self._lock:
+            self._reserved -= slots
+
+    @contextmanager
+    def reservation(self, slots: int = 1) -> Iterator[int]:
+        position = self.reserve(slots)
+        try:
+            yield position
+        finally:
+            self.release(slots)
+
+    def _reject(self) -> None:
+        retry_after = self._retry_after()
+        logger.warning(f"{self.name} queue full ({self._load()} pending), rejecting request")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy ({self.name} queue full). Retry later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def run(
+        self, fn: Callable[..., Any], *args, enforce_limit: bool = True, reserved: bool = False, **kwargs
+    ) -> Any:
+        """Run ``fn`` on the pool; raise 429 if the queue is full.
+
+        ``enforce_limit=False`` admits the job regardless, for follow-up work
+        of a request that was already admitted (e.g. later stream chunks).
+        ``reserved=True`` runs work whose slots are already held through
+        ``reserve``, without limiting or counting it again.
+        """
+        counted = not reserved
+        with self._lock:
+            if counted and enforce_limit and self._load() >= self.max_concurrency + self.max_queue:
+                self._reject()
+            position = max(0, self._load() - self.max_concurrency + 1)
+            if counted:
+                self._pending += 1
+        _queue_position.set(position)
+        if position and counted:
+            logger.info(f"{self.name} job queued at position {position}")
+
+        # Carry request-scoped context vars into the worker thread
+        ctx = contextvars.copy_context()
+        future = self._pool.submit(ctx.run, self._timed, fn, *args, **kwargs)
+        # A cancelled caller (e.g. a client disconnect) does not stop the
+        # thread, so the slot is freed when the work itself finishes
+        if counted:
+            future.add_done_callback(self._release)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            if not counted and not future.done():
+                # The caller's reservation ends with it; count the orphaned work until it finishes
+                with self._lock:
+                    self._pending += 1
+                future.add_done_callback(self._release)
+            raise
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def _timed(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        t0 = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.time() - t0
+            metrics.EXECUTOR_JOB_SECONDS.labels(self.name).observe(elapsed)
+            with self._lock:
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            load = self._load()
+            return {
+                "running": min(load, self.max_concurrency),
+                "queued": max(0, load - self.max_concurrency),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,168 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+import torch
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Match
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+REQUESTS = Counter(
+    "lyre_requests_total", "HTTP requests by route, status and language", ["route", "status", "language"]
+)
+REQUEST_SECONDS = Histogram(
+    "lyre_request_duration_seconds", "End-to-end request latency", ["route"], buckets=STAGE_BUCKETS
+)
+IN_FLIGHT = Gauge("lyre_requests_in_flight", "Requests currently being handled", ["route"])
+STAGE_SECONDS = Histogram(
+    "lyre_stage_duration_seconds",
+    "Time spent per processing stage (decode, resample, inference, encode, effects)",
+    ["route", "stage"],
+    buckets=STAGE_BUCKETS,
+)
+EXECUTOR_JOB_SECONDS = Histogram(
+    "lyre_executor_job_seconds", "Compute time of jobs on each inference executor", ["executor"], buckets=STAGE_BUCKETS
+)
+INPUT_AUDIO_SECONDS = Histogram(
+    "lyre_input_audio_seconds",
+    "Duration of decoded input audio",
+    ["route"],
+    buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800),
+)
+TEXT_LENGTH = Histogram(
+    "lyre_text_length_chars",
+    "Length of text submitted for synthesis",
+    ["route"],
+    buckets=(10, 25, 50, 100, 200, 400, 800, 1600, 3200),
+)
+
+# Per-request labels, set by the middleware and filled in by routes. Work
+# outside any one request (startup, batched model jobs shared by several
+# requests) is labelled "internal".
+_request: ContextVar[Optional[dict]] = ContextVar("metrics_request", default=None)
+
+
+def _route() -> str:
+    request = _request.get()
+    return request["route"] if request else "internal"
+
+
+def label_request(language: str) -> None:
+    """Attach the request's language to its request counter."""
+    request = _request.get()
+    if request is not None:
+        request["language"] = language
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(_route(), name).observe(time.perf_counter() - t0)
+
+
+def observe_input_audio(seconds: float) -> None:
+    INPUT_AUDIO_SECONDS.labels(_route()).observe(seconds)
+
+
+def observe_text_length(chars: int) -> None:
+    TEXT_LENGTH.labels(_route()).observe(chars)
+
+
+def _route_template(scope) -> str:
+    partial = None
+    for route in getattr(scope.get("app"), "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+
+class MetricsMiddleware:
+    """Counts requests and records their latency, labelled by route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = _route_template(scope)
+        request = {"route": route, "language": "none", "status": "500"}
+        token = _request.set(request)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                request["status"] = str(message["status"])
+            await send(message)
+
+        IN_FLIGHT.labels(route).inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_SECONDS.labels(route).observe(time.perf_counter() - t0)
+            REQUESTS.labels(route, request["status"], request["language"]).inc()
+            IN_FLIGHT.labels(route).dec()
+            _request.reset(token)
+
+
+class StateCollector:
+    """Scrape-time gauges for executor queues, model residency and device memory."""
+
+    def __init__(self, state):
+        self.state = state
+
+    def collect(self):
+        running = GaugeMetricFamily("lyre_executor_running", "Jobs running per executor", labels=["executor"])
+        queued = GaugeMetricFamily("lyre_executor_queued", "Jobs waiting per executor", labels=["executor"])
+        for name, executor in self.state.executors.items():
+            stats = executor.stats()
+            running.add_metric([name], stats["running"])
+            queued.add_metric([name], stats["queued"])
+        yield running
+        yield queued
+
+        model_bytes = GaugeMetricFamily(
+            "lyre_model_bytes", "Approximate model size by where it is resident", labels=["model", "residency"]
+        )
+        for name, stats in self.state.residency.stats().items():
+            model_bytes.add_metric([name, stats["residency"]], stats["size_mb"] * 1e6)
+        yield model_bytes
+
+        memory = GaugeMetricFamily("lyre_device_memory_bytes", "Accelerator memory", labels=["device", "kind"])
+        if torch.cuda.is_available():
+            for i in range(torch.cuda.device_count()):
+                device = f"cuda:{i}"
+                memory.add_metric([device, "allocated"], torch.cuda.memory_allocated(i))
+                memory.add_metric([device, "reserved"], torch.cuda.memory_reserved(i))
+                memory.add_metric([device, "max_allocated"], torch.cuda.max_memory_allocated(i))
+        elif torch.backends.mps.is_available():
+            memory.add_metric(["mps", "allocated"], torch.mps.current_allocated_memory())
+            memory.add_metric(["mps", "driver_allocated"], torch.mps.driver_allocated_memory())
+        yield memory
+
+
+_collector: Optional[StateCollector] = None
+
+
+def register_state(state) -> None:
+    global _collector
+    if _collector is None:
+        _collector = StateCollector(state)
+        REGISTRY.register(_collector)
+
+
+def metrics_endpoint(request: Request) -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
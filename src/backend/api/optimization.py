@@ -0,0 +1,91 @@
+import functools
+import logging
+import os
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Optional, Set
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+CPU_OPTIMIZATION_CHOICES = {"int8", "bf16", "compile"}
+
+
+def parse_cpu_optimizations(value: str) -> Set[str]:
+    """Parse a comma-separated CPU_OPTIMIZATIONS value such as ``"int8,bf16"``."""
+    flags = {flag.strip().lower() for flag in value.split(",") if flag.strip()}
+    unknown = flags - CPU_OPTIMIZATION_CHOICES
+    if unknown:
+        logger.warning(f"Ignoring unknown CPU optimizations: {', '.join(sorted(unknown))}")
+    return flags & CPU_OPTIMIZATION_CHOICES
+
+
+CPU_OPTIMIZATIONS = parse_cpu_optimizations(os.getenv("CPU_OPTIMIZATIONS", ""))
+
+
+def cpu_supports_bf16() -> bool:
+    """True when oneDNN reports native bf16 kernels (AVX512-BF16 / AMX)."""
+    mkldnn_ops = getattr(torch.ops, "mkldnn", None)
+    check = getattr(mkldnn_ops, "_is_mkldnn_bf16_supported", None)
+    return bool(torch.backends.mkldnn.is_available() and check is not None and check())
+
+
+def quantize_linear_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Apply int8 dynamic quantization to every nn.Linear, in place."""
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def compile_forward(module: torch.nn.Module) -> None:
+    """Wrap a module's forward with torch.compile (dynamic shapes for autoregressive decoding)."""
+    module.forward = torch.compile(module.forward, dynamic=True)
+
+
+class CpuOptimizer:
+    """Applies the opt-in CPU inference optimizations selected by CPU_OPTIMIZATIONS.
+
+    Only active when running on CPU. ``int8`` quantizes linear layers,
+    ``compile`` wraps hot modules with torch.compile, and ``bf16`` runs
+    selected calls under bf16 autocast when the CPU has native bf16 support.
+    ``int8`` wins over ``bf16``: dynamically quantized layers only accept
+    float32 activations.
+    """
+
+    def __init__(self, device: str, flags: Set[str]):
+        self.flags = flags if device == "cpu" else set()
+        if {"int8", "bf16"} <= self.flags:
+            logger.warning("bf16 cannot be combined with int8 quantization; staying in float32")
+            self.flags = self.flags - {"bf16"}
+        self.bf16 = "bf16" in self.flags and cpu_supports_bf16()
+        if "bf16" in self.flags and not self.bf16:
+            logger.warning("bf16 requested but this CPU lacks native bf16 support; staying in float32")
+        if self.flags:
+            logger.info(f"CPU optimizations enabled: {', '.join(sorted(self.flags))}")
+
+    def prepare(self, module: torch.nn.Module, hot: Optional[torch.nn.Module] = None) -> torch.nn.Module:
+        """Quantize ``module`` and compile ``hot`` (defaults to ``module``) as configured."""
+        if "int8" in self.flags:
+            module = quantize_linear_int8(module)
+        if "compile" in self.flags:
+            compile_forward(hot if hot is not None else module)
+        return module
+
+    def autocast(self) -> ContextManager:
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return nullcontext()
+
+    def autocast_calls(self, fn: Callable) -> Callable:
+        """Wrap ``fn`` so each call runs under ``autocast``.
+
+        For models where only part of the forward pass tolerates bf16, such as
+        Chatterbox, whose vocoder needs complex float32 ops.
+        """
+        if not self.bf16:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.autocast():
+                return fn(*args, **kwargs)
+
+        return wrapper
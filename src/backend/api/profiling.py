@@ -0,0 +1,143 @@
+import hmac
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, List, Optional
+from urllib.parse import parse_qs
+
+import torch
+from fastapi import HTTPException
+from torch.profiler import ProfilerActivity, profile
+
+logger = logging.getLogger(__name__)
+
+# Profiling is off unless an admin sets a token; requests opt in by sending
+# it as the X-Profile header or the ?profile= query parameter.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(tempfile.gettempdir()) / "lyre-profiles"))
+PROFILE_MAX_SESSIONS = int(os.getenv("PROFILE_MAX_SESSIONS", "20"))
+
+
+@dataclass
+class ProfileSession:
+    profile_id: str
+    path: Path
+    counter: Iterator[int] = field(default_factory=itertools.count)
+
+
+_session: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def active() -> bool:
+    """True when the current request asked to be profiled."""
+    return _session.get() is not None
+
+
+@contextmanager
+def trace(name: str) -> Iterator[None]:
+    """Profile the enclosed model call if the current request is being profiled.
+
+    Writes a Chrome trace (open in chrome://tracing or Perfetto) and a
+    collapsed-stack file for flamegraph tools into the request's session
+    directory. Without an active session this is a single context lookup.
+    """
+    session = _session.get()
+    if session is None:
+        yield
+        return
+
+    cuda = torch.cuda.is_available()
+    activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if cuda else [])
+    with profile(activities=activities, record_shapes=True, with_stack=True) as prof:
+        yield
+    stem = session.path / f"{next(session.counter):02d}-{name}"
+    prof.export_chrome_trace(f"{stem}.trace.json")
+    prof.export_stacks(f"{stem}.stacks.txt", "self_cuda_time_total" if cuda else "self_cpu_time_total")
+    logger.info(f"Profile written: {stem.name} ({session.profile_id})")
+
+
+def _token_matches(value: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN and value and hmac.compare_digest(value, PROFILE_TOKEN))
+
+
+def check_token(value: Optional[str]) -> None:
+    """Guard the profile endpoints: 404 when profiling is off, 403 on a bad token."""
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not _token_matches(value):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+def _start_session() -> ProfileSession:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    sessions = sorted((p for p in PROFILE_DIR.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime)
+    for old in sessions[: max(0, len(sessions) - PROFILE_MAX_SESSIONS + 1)]:
+        shutil.rmtree(old, ignore_errors=True)
+    profile_id = uuid.uuid4().hex
+    path = PROFILE_DIR / profile_id
+    path.mkdir()
+    return ProfileSession(profile_id, path)
+
+
+def session_path(profile_id: str) -> Path:
+    path = PROFILE_DIR / profile_id
+    if not profile_id.isalnum() or not path.is_dir():
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    return path
+
+
+def list_artifacts(profile_id: str) -> List[str]:
+    return sorted(p.name for p in session_path(profile_id).iterdir())
+
+
+def artifact_path(profile_id: str, filename: str) -> Path:
+    path = session_path(profile_id) / filename
+    if Path(filename).name != filename or not path.is_file():
+        raise HTTPException(status_code=404, detail="Unknown profile artifact")
+    return path
+
+
+class ProfilingMiddleware:
+    """Starts a profiling session for requests that carry the profile token.
+
+    The session ID is returned in the X-Profile-Id response header; traces
+    are fetched from /api/profiles/{profile_id}.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/api/profiles") or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        session = _start_session()
+        token = _session.set(session)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", session.profile_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _session.reset(token)
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        for key, value in scope["headers"]:
+            if key == b"x-profile":
+                return _token_matches(value.decode("latin-1"))
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return _token_matches(query.get("profile", [None])[0])
@@ -0,0 +1,242 @@
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+import torch
+
+logger = logging.getLogger(__name__)
+
+ON_DEVICE = "device"
+ON_CPU = "cpu"
+UNLOADED = "unloaded"
+# Being loaded, moved or offloaded outside the lock; wait on the slot's event
+MOVING = "moving"
+
+
+def module_bytes(*modules: torch.nn.Module) -> int:
+    """Approximate memory held by the weights of ``modules``.
+
+    Walks the state dict rather than parameters() so int8 dynamically
+    quantized layers, whose weights live in packed params, are counted.
+    Tensors shared between entries (tied weights) are counted once.
+    """
+    seen = set()
+    total = 0
+
+    def add(value) -> None:
+        nonlocal total
+        if isinstance(value, torch.Tensor):
+            key = (value.device, value.data_ptr())
+            if key not in seen:
+                seen.add(key)
+                total += value.element_size() * value.nelement()
+        elif isinstance(value, (tuple, list)):
+            for item in value:
+                add(item)
+
+    for module in modules:
+        for value in module.state_dict(keep_vars=True).values():
+            add(value)
+    return total
+
+
+@dataclass
+class ModelSlot:
+    name: str
+    load: Callable[[], int]
+    move: Callable[[str], None]
+    unload: Callable[[], None]
+    residency: str = UNLOADED
+    size_bytes: int = 0
+    last_used: float = 0.0
+    in_use: int = 0
+    settled: threading.Event = field(default_factory=threading.Event, repr=False)
+
+
+class ResidencyManager:
+    """Tracks where each model lives and moves idle ones off the accelerator.
+
+    Each model registers callbacks to load it onto the device (returning its
+    size in bytes), move it between the device and CPU, and release it. Work
+    wraps model calls in ``use(name)``, which brings the model back on
+    demand. Models idle for ``idle_seconds`` are offloaded to CPU or, with
+    ``offload="unload"``, dropped entirely. When ``budget_bytes`` is set,
+    loading a model first evicts the least recently used idle ones so the
+    models on the device fit in the budget.
+    """
+
+    def __init__(
+        self,
+        device: str,
+        idle_seconds: Optional[float] = None,
+        offload: str = ON_CPU,
+        budget_bytes: Optional[int] = None,
+    ):
+        self.device = device
+        self.idle_seconds = idle_seconds
+        # Offloading to CPU is meaningless when the device is the CPU
+        self.offload = UNLOADED if device == "cpu" else offload
+        self.budget_bytes = budget_bytes
+        self._slots: Dict[str, ModelSlot] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def register(
+        self,
+        name: str,
+        load: Callable[[], int],
+        move: Callable[[str], None],
+        unload: Callable[[], None],
+    ) -> None:
+        self._slots[name] = ModelSlot(name, load, move, unload)
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[None]:
+        slot = self._slots[name]
+        self._acquire(slot)
+        try:
+            yield
+        finally:
+            with self._lock:
+                slot.in_use -= 1
+                slot.last_used = time.time()
+
+    def _acquire(self, slot: ModelSlot) -> None:
+        """Make ``slot`` resident and count it as in use.
+
+        The lock only guards bookkeeping: slots being loaded or offloaded are
+        marked MOVING and the slow work runs outside it, so stats, the sweeper
+        and other models are never blocked behind a load. Concurrent callers
+        for the same slot wait on its event and re-check.
+        """
+        while True:
+            with self._lock:
+                if slot.residency == ON_DEVICE:
+                    slot.in_use += 1
+                    return
+                if slot.residency != MOVING:
+                    source = slot.residency
+                    victims = self._make_room(slot)
+                    self._begin_move(slot)
+                    break
+                settled = slot.settled
+            settled.wait()
+
+        for victim in victims:
+            self._offload(victim)
+        # A model's size is only known once it has been loaded
+        sized = slot.size_bytes > 0
+        t0 = time.time()
+        try:
+            if source == ON_CPU:
+                slot.move(self.device)
+            else:
+                slot.size_bytes = slot.load()
+        except BaseException:
+            self._end_move(slot, source)
+            raise
+        logger.info(f"{slot.name} made resident on {self.device} from {source} in {time.time() - t0:.1f}s")
+        self._end_move(slot, ON_DEVICE, claim=True)
+        if not sized:
+            with self._lock:
+                victims = self._make_room(slot)
+            for victim in victims:
+                self._offload(victim)
+
+    def _begin_move(self, slot: ModelSlot) -> None:
+        slot.residency = MOVING
+        slot.settled = threading.Event()
+
+    def _end_move(self, slot: ModelSlot, residency: str, claim: bool = False) -> None:
+        with self._lock:
+            slot.residency = residency
+            if claim:
+                slot.in_use += 1
+            slot.settled.set()
+
+    def _make_room(self, incoming: ModelSlot) -> List[ModelSlot]:
+        """Pick idle models to offload so ``incoming`` fits; marks them MOVING."""
+        if not self.budget_bytes:
+            return []
+        resident = [s for s in self._slots.values() if s.residency == ON_DEVICE and s is not incoming]
+        used = sum(s.size_bytes for s in resident)
+        victims = []
+        for slot in sorted(resident, key=lambda s: s.last_used):
+            if used + incoming.size_bytes <= self.budget_bytes:
+                break
+            if slot.in_use:
+                continue
+            self._begin_move(slot)
+            victims.append(slot)
+            used -= slot.size_bytes
+        if used + incoming.size_bytes > self.budget_bytes:
+            logger.warning(f"Loading {incoming.name} exceeds the model memory budget")
+        return victims
+
+    def _offload(self, slot: ModelSlot) -> None:
+        """Offload a slot already marked MOVING; called without the lock."""
+        try:
+            if self.offload == ON_CPU:
+                slot.move("cpu")
+                residency = ON_CPU
+            else:
+                slot.unload()
+                residency = UNLOADED
+                gc.collect()
+        except Exception as exc:
+            logger.warning(f"Offloading {slot.name} failed: {exc}")
+            self._end_move(slot, ON_DEVICE)
+            return
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+        self._end_move(slot, residency)
+        logger.info(f"{slot.name} offloaded ({residency})")
+
+    def sweep(self) -> None:
+        """Offload models that have been idle longer than ``idle_seconds``."""
+        if not self.idle_seconds:
+            return
+        now = time.time()
+        with self._lock:
+            idle = [
+                slot
+                for slot in self._slots.values()
+                if slot.residency == ON_DEVICE and not slot.in_use and now - slot.last_used > self.idle_seconds
+            ]
+            for slot in idle:
+                self._begin_move(slot)
+        for slot in idle:
+            self._offload(slot)
+
+    def start(self) -> None:
+        if not self.idle_seconds or self._sweeper is not None:
+            return
+
+        def _loop() -> None:
+            interval = max(1.0, min(self.idle_seconds / 4, 30.0))
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                except Exception as exc:
+                    logger.warning(f"Residency sweep failed: {exc}")
+
+        self._sweeper = threading.Thread(target=_loop, name="model-residency", daemon=True)
+        self._sweeper.start()
+
+    def stats(self) -> Dict[str, dict]:
+        now = time.time()
+        with self._lock:
+            return {
+                slot.name: {
+                    "residency": slot.residency,
+                    "size_mb": round(slot.size_bytes / 1e6, 1),
+                    "idle_seconds": round(now - slot.last_used, 1) if slot.last_used else None,
+                    "in_use": slot.in_use,
+                }
+                for slot in self._slots.values()
+            }
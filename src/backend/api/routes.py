@@ -1,25 +1,53 @@
+import asyncio
+import io
 import json
 import logging
 import os
+import re
+import struct
 import tempfile
+import zipfile
+from typing import BinaryIO, Optional
+from urllib.parse import quote
 
-import torch
-import torchaudio
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import (
+    APIRouter,
+    UploadFile,
+    File,
+    Form,
+    Header,
+    HTTPException,
+    BackgroundTasks,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 
-from api import config
+from api import config, metrics, profiling
+from api.executor import current_queue_position
 from api.state import get_state
-from api.schemas import TranslationResponse, StatusResponse
+from api.schemas import JobResponse, TranslationResponse, TranslationSegment, StatusResponse
+from voice_services import audio_handler
+from voice_services.effects_session import EffectsSession
 from voice_services import realtime_effects
 from voice_services import translation
 from voice_services import speech_synthesis
-from voice_services import audio_handler
+from voice_services import pipeline
+from voice_services import jobs
+from voice_services.job_store import DONE, Job
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
+EFFECTS_STREAMING_MIN_BYTES = int(os.getenv("EFFECTS_STREAMING_MIN_MB", "64")) * 1024 * 1024
+EFFECTS_BATCH_MAX = int(os.getenv("EFFECTS_BATCH_MAX", "16"))
+# Responses whose format can come from the Accept header must not be
+# cached across clients that ask for different formats
+VARY_ACCEPT = {"Vary": "Accept"}
+
 
 def cleanup_file(path: str):
     """Remove a temp file if it exists."""
@@ -31,9 +59,31 @@ def cleanup_file(path: str):
 def get_status():
     """Return backend readiness status for cold start detection."""
     state = get_state()
-    if state.seamless_model and state.chatterbox:
-        return {"status": "ready"}
-    return {"status": "loading"}
+    status = "ready" if state.models_ready else "loading"
+    result = {"status": status, "models": state.residency.stats()}
+    result["queues"] = {name: ex.stats() for name, ex in state.executors.items()}
+    if state.synthesis_cache is not None:
+        result["synthesis_cache"] = state.synthesis_cache.stats()
+    result["jobs"] = state.job_store.counts()
+    return result
+
+
+@router.get("/profiles/{profile_id}")
+def list_profile(profile_id: str, x_profile: Optional[str] = Header(None), profile: Optional[str] = None):
+    """List the trace files captured for a profiled request."""
+    profiling.check_token(x_profile or profile)
+    return {"profile_id": profile_id, "artifacts": profiling.list_artifacts(profile_id)}
+
+
+@router.get("/profiles/{profile_id}/{filename}")
+def get_profile_artifact(
+    profile_id: str, filename: str, x_profile: Optional[str] = Header(None), profile: Optional[str] = None
+):
+    """Download a Chrome trace or flamegraph stack file from a profiled request."""
+    profiling.check_token(x_profile or profile)
+    path = profiling.artifact_path(profile_id, filename)
+    media_type = "application/json" if filename.endswith(".json") else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=filename)
 
 
 @router.get("/effects")
@@ -56,87 +106,216 @@ def get_languages():
 
 @router.post("/voice-reference", response_model=StatusResponse)
 async def upload_voice_reference(file: UploadFile = File(...)):
-    """Upload a reference voice sample for cloning."""
-    state = get_state()
-    
-    # Clean up old temp file if exists
-    if state.voice_reference_path and os.path.exists(state.voice_reference_path):
-        os.unlink(state.voice_reference_path)
-    
-    # Save uploaded bytes to temp file (might be webm, ogg, wav, etc.)
+    """Upload a reference voice sample for cloning and return its voice ID."""
     content = await file.read()
-    tmp_input = tempfile.NamedTemporaryFile(delete=False, suffix=".webm")
-    tmp_input.write(content)
-    tmp_input.close()
-    
     logger.info(f"Voice reference uploaded: {len(content)} bytes")
-    
-    # Convert to proper WAV format using torchaudio
-    try:
-        waveform, sr = torchaudio.load(tmp_input.name)
-        logger.debug(f"Audio loaded: shape={waveform.shape}, sr={sr}")
-        
-        # Resample to 24kHz if needed (chatterbox expects this)
-        if sr != 24000:
-            waveform = torchaudio.transforms.Resample(sr, 24000)(waveform)
-            logger.debug("Resampled to 24kHz")
-        
-        # Save as proper WAV
-        tmp_wav = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        torchaudio.save(tmp_wav.name, waveform, 24000)
-        tmp_wav.close()
-        
-        logger.info(f"Voice reference converted to WAV: {tmp_wav.name}")
-        state.voice_reference_path = tmp_wav.name
-    finally:
-        # Clean up the input temp file
-        os.unlink(tmp_input.name)
-    
-    return StatusResponse(status="ok", path=state.voice_reference_path)
+    executor = get_state().executors["chatterbox"]
+    voice_id = await executor.run(speech_synthesis.register_voice_reference, content)
+    return StatusResponse(status="ok", voice_id=voice_id)
 
 
-@router.delete("/voice-reference", response_model=StatusResponse)
-def clear_voice_reference():
-    """Clear the uploaded voice sample."""
+@router.delete("/voice-reference/{voice_id}", response_model=StatusResponse)
+def clear_voice_reference(voice_id: str):
+    """Remove an uploaded voice sample."""
     state = get_state()
-    if state.voice_reference_path and os.path.exists(state.voice_reference_path):
-        os.unlink(state.voice_reference_path)
-    state.voice_reference_path = None
-    logger.info("Voice reference cleared")
-    return StatusResponse(status="ok")
+    if not state.voice_store.remove(voice_id):
+        raise HTTPException(status_code=404, detail="Unknown voice_id")
+    logger.info(f"Voice reference cleared: {voice_id}")
+    return StatusResponse(status="ok", voice_id=voice_id)
 
 
 @router.post("/apply-effects")
 async def apply_effects_to_audio(
     audio: UploadFile = File(...),
     effects: str = Form("{}"),
+    streaming: bool = Form(False),
+    output_format: Optional[str] = Form(None, alias="format"),
+    bitrate: Optional[int] = Form(None),
+    accept: Optional[str] = Header(None),
     background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
-    """Apply pedalboard effects to uploaded audio."""
-    raw = await audio.read()
-    tmp_input = audio_handler.save_upload_to_temp(raw)
-    tmp_output = None
-    
+    """Apply pedalboard effects to uploaded audio.
+
+    Large uploads (or ``streaming=true``) are processed block by block
+    straight from the spooled upload so memory stays bounded. The output
+    format comes from ``format`` or the Accept header (see negotiate_format).
+    """
+    try:
+        effects_config = json.loads(effects or "{}")
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Invalid effects payload") from exc
+    fmt = audio_handler.negotiate_format(output_format, accept)
+    media_type = audio_handler.OUTPUT_FORMATS[fmt]
+
+    # Pedalboard work is CPU-bound; keep it off the event loop
+    if streaming or (audio.size or 0) >= EFFECTS_STREAMING_MIN_BYTES:
+        output_path = await run_in_threadpool(_render_effects_streaming, audio.file, effects_config, fmt, bitrate)
+    else:
+        raw = await audio.read()
+        data = await run_in_threadpool(realtime_effects.render_effects, raw, effects_config, fmt, bitrate)
+        return Response(content=data, media_type=media_type, headers=VARY_ACCEPT)
+    background_tasks.add_task(cleanup_file, output_path)
+    return FileResponse(output_path, media_type=media_type, headers=VARY_ACCEPT)
+
+
+def _render_effects_streaming(upload, effects_config: dict, fmt: str, bitrate: Optional[int]) -> str:
+    tmp_output = tempfile.NamedTemporaryFile(delete=False)
+    tmp_output.close()
+    try:
+        realtime_effects.render_effects_to_file(upload, tmp_output.name, effects_config, fmt, bitrate)
+    except Exception:
+        cleanup_file(tmp_output.name)
+        raise
+    return tmp_output.name
+
+
+@router.post("/apply-effects/batch")
+async def apply_effects_batch(
+    audio: UploadFile = File(...),
+    effects: str = Form(...),
+    output_format: Optional[str] = Form(None, alias="format"),
+    bitrate: Optional[int] = Form(None),
+    accept: Optional[str] = Header(None),
+):
+    """Render several effects configs from one upload and return them as a zip.
+
+    ``effects`` is a JSON list of configs, or an object mapping variant names
+    (e.g. preset names) to configs. The clip is decoded once and the chains
+    are rendered in parallel.
+    """
     try:
-        waveform, sr = torchaudio.load(tmp_input)
+        variants = json.loads(effects)
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Invalid effects payload") from exc
+    if isinstance(variants, list):
+        variants = {f"variant-{i}": config for i, config in enumerate(variants)}
+    if not isinstance(variants, dict) or not variants or not all(isinstance(c, dict) for c in variants.values()):
+        raise HTTPException(status_code=400, detail="effects must be a non-empty list or object of effects configs")
+    if len(variants) > EFFECTS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {EFFECTS_BATCH_MAX} variants per request")
+    fmt = audio_handler.negotiate_format(output_format, accept)
+
+    raw = await audio.read()
+    rendered = await run_in_threadpool(
+        realtime_effects.render_variants, raw, list(variants.values()), fmt, bitrate
+    )
+    data = await run_in_threadpool(_zip_variants, list(variants), rendered, audio_handler.FILE_EXTENSIONS[fmt])
+    return Response(
+        content=data,
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="effects.zip"', **VARY_ACCEPT},
+    )
+
+
+def _zip_variants(names, rendered, extension: str) -> bytes:
+    buffer = io.BytesIO()
+    # Stored, not deflated: encoded audio barely compresses
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for i, (name, data) in enumerate(zip(names, rendered)):
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(name)).strip("._") or "variant"
+            archive.writestr(f"{i:02d}-{safe_name}.{extension}", data)
+    return buffer.getvalue()
+
+
+@router.websocket("/effects/session")
+async def effects_session(websocket: WebSocket):
+    """Interactive effects: upload a clip once, then tweak parameters live.
+
+    Client messages:
+      - binary: the clip (any format decode_audio accepts); replaces the current one
+      - ``{"type": "effects", "effects": {...}}``: replace the whole chain
+      - ``{"type": "set", "effect": name, "params": {...}}``: parameter delta
+      - ``{"type": "remove", "effect": name}``
+      - ``{"type": "render"}``: re-render without changes
+    Every message may carry ``position`` (seconds, default 0), the playhead
+    to render from. Each change cancels the render in progress and starts a
+    new one: ``{"type": "render", "id", "position"}``, then binary blocks of a
+    little-endian uint32 frame offset followed by interleaved PCM16, then
+    ``{"type": "done", "id"}``. The server sends ``{"type": "ready", ...}``
+    after a clip loads and ``{"type": "error", "detail"}`` on bad input.
+
+    Local development only: the deployed API proxy (deploy/frontend) forwards
+    plain HTTP, so production clients use /apply-effects instead.
+    """
+    await websocket.accept()
+    session: Optional[EffectsSession] = None
+    effects_config: dict = {}
+    render_task: Optional[asyncio.Task] = None
+    render_step: Optional[asyncio.Task] = None
+    render_id = 0
+
+    async def cancel_render():
+        if render_task is not None:
+            render_task.cancel()
+            await asyncio.gather(render_task, return_exceptions=True)
+        # Cancelling does not stop a block already rendering in the threadpool;
+        # wait for it so the next change and render have the board to themselves
+        if render_step is not None:
+            await asyncio.gather(render_step, return_exceptions=True)
+
+    async def render(current: EffectsSession, rid: int, position: float):
+        nonlocal render_step
         try:
-            effects_config = json.loads(effects or "{}")
-        except json.JSONDecodeError as exc:
-            raise HTTPException(status_code=400, detail="Invalid effects payload") from exc
-
-        if effects_config:
-            wav_np = waveform.numpy()
-            wav_np = realtime_effects.apply_effects(wav_np, sr, effects_config)
-            waveform = torch.from_numpy(wav_np)
-
-        tmp_output = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        torchaudio.save(tmp_output.name, waveform, sr)
-        tmp_output.close()
-        
-        background_tasks.add_task(cleanup_file, tmp_output.name)
-        return FileResponse(tmp_output.name, media_type="audio/wav")
+            await websocket.send_json({"type": "render", "id": rid, "position": position})
+            blocks = current.render(position)
+            # One block per threadpool hop so a newer change can cancel in between
+            while True:
+                render_step = asyncio.ensure_future(run_in_threadpool(next, blocks, None))
+                item = await asyncio.shield(render_step)
+                if item is None:
+                    break
+                offset, block = item
+                await websocket.send_bytes(struct.pack("<I", offset) + audio_handler.to_pcm16_bytes(block))
+            await websocket.send_json({"type": "done", "id": rid})
+        except Exception as exc:
+            logger.warning(f"Effects session render failed: {exc}")
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            position = 0.0
+            if message.get("bytes") is not None:
+                await cancel_render()
+                try:
+                    session = await run_in_threadpool(EffectsSession.decode, message["bytes"])
+                except Exception as exc:
+                    await websocket.send_json({"type": "error", "detail": f"Could not decode audio: {exc}"})
+                    continue
+                await websocket.send_json({
+                    "type": "ready",
+                    "sample_rate": session.sample_rate,
+                    "channels": session.channels,
+                    "frames": session.frames,
+                })
+            else:
+                try:
+                    command = json.loads(message.get("text") or "{}")
+                    position = float(command.get("position", 0.0))
+                    kind = command.get("type")
+                    if kind == "effects":
+                        effects_config = dict(command.get("effects") or {})
+                    elif kind == "set":
+                        name = command["effect"]
+                        effects_config[name] = {**effects_config.get(name, {}), **command.get("params", {})}
+                    elif kind == "remove":
+                        effects_config.pop(command["effect"], None)
+                    elif kind != "render":
+                        raise ValueError(f"Unknown message type: {kind}")
+                except (KeyError, TypeError, ValueError, AttributeError) as exc:
+                    await websocket.send_json({"type": "error", "detail": str(exc) or type(exc).__name__})
+                    continue
+                if session is None:
+                    continue
+                await cancel_render()
+            await run_in_threadpool(session.set_effects, effects_config)
+            render_id += 1
+            render_task = asyncio.create_task(render(session, render_id, position))
+    except WebSocketDisconnect:
+        pass
     finally:
-        cleanup_file(tmp_input)
+        await cancel_render()
 
 
 @router.post("/translate", response_model=TranslationResponse)
@@ -144,25 +323,221 @@ async def translate_only(
     audio: UploadFile = File(...),
     translate_to: str = Form(...),
 ):
-    """Translate audio to text in the target language."""
-    translated_text = await translation.translate_audio(audio, translate_to)
-    return TranslationResponse(translated_text=translated_text)
+    """Translate audio to text in the target language.
+
+    Long clips are split at pauses; ``segments`` gives each part's text and
+    its start/end time in seconds.
+    """
+    metrics.label_request(translate_to)
+    segments = await translation.translate_audio(audio, translate_to)
+    return TranslationResponse(
+        translated_text=translation.join_segments(segments),
+        segments=[TranslationSegment(start=seg.start, end=seg.end, text=seg.text) for seg in segments],
+    )
 
 
 @router.post("/synthesize")
 async def synthesize_only(
     text: str = Form(...),
+    voice_id: str = Form(...),
     language: str = Form("English"),
     expressiveness: float = Form(0.5),
     similarity: float = Form(0.6),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
+    seed: Optional[int] = Form(None),
+    output_format: Optional[str] = Form(None, alias="format"),
+    bitrate: Optional[int] = Form(None),
+    accept: Optional[str] = Header(None),
 ):
     """Synthesize speech using the uploaded voice reference."""
-    output_path = speech_synthesis.synthesize_text(
+    metrics.label_request(language)
+    fmt = audio_handler.negotiate_format(output_format, accept)
+    data = await speech_synthesis.synthesize(
         text=text,
+        voice_id=voice_id,
         language=language,
         expressiveness=expressiveness,
         similarity=similarity,
+        seed=seed,
+        fmt=fmt,
+        bitrate=bitrate,
     )
-    background_tasks.add_task(cleanup_file, output_path)
-    return FileResponse(output_path, media_type="audio/wav")
+    return Response(
+        content=data,
+        media_type=audio_handler.OUTPUT_FORMATS[fmt],
+        headers={"X-Queue-Position": str(current_queue_position()), **VARY_ACCEPT},
+    )
+
+
+@router.post("/synthesize/stream")
+async def synthesize_stream(
+    text: str = Form(...),
+    voice_id: str = Form(...),
+    language: str = Form("English"),
+    expressiveness: float = Form(0.5),
+    similarity: float = Form(0.6),
+    seed: Optional[int] = Form(None),
+):
+    """Stream synthesized speech sentence by sentence as a PCM16 WAV."""
+    metrics.label_request(language)
+    chunks = speech_synthesis.synthesize_stream(
+        text=text,
+        voice_id=voice_id,
+        language=language,
+        expressiveness=expressiveness,
+        similarity=similarity,
+        seed=seed,
+    )
+    return StreamingResponse(chunks, media_type="audio/wav")
+
+
+@router.post("/voice-translate")
+async def voice_translate(
+    audio: UploadFile = File(...),
+    translate_to: str = Form(...),
+    voice: Optional[UploadFile] = File(None),
+    voice_id: Optional[str] = Form(None),
+    expressiveness: float = Form(0.5),
+    similarity: float = Form(0.6),
+    seed: Optional[int] = Form(None),
+    effects: str = Form("{}"),
+    output_format: Optional[str] = Form(None, alias="format"),
+    bitrate: Optional[int] = Form(None),
+    accept: Optional[str] = Header(None),
+):
+    """Translate speech and re-voice it in one call: translate, synthesize, then effects.
+
+    The voice is taken from ``voice_id``, else the ``voice`` upload, else the
+    content clip itself. Stage timings are returned in ``Server-Timing``.
+    """
+    metrics.label_request(translate_to)
+    try:
+        effects_config = json.loads(effects or "{}")
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Invalid effects payload") from exc
+    fmt = audio_handler.negotiate_format(output_format, accept)
+
+    result = await pipeline.voice_translate(
+        content=await audio.read(),
+        translate_to=translate_to,
+        voice=await voice.read() if voice else None,
+        voice_id=voice_id,
+        expressiveness=expressiveness,
+        similarity=similarity,
+        seed=seed,
+        effects_config=effects_config,
+        fmt=fmt,
+        bitrate=bitrate,
+    )
+    return Response(
+        content=result.audio,
+        media_type=audio_handler.OUTPUT_FORMATS[fmt],
+        headers={
+            "Server-Timing": result.server_timing(),
+            "X-Translated-Text": quote(result.translated_text),
+            "X-Voice-Id": result.voice_id,
+            **VARY_ACCEPT,
+        },
+    )
+
+
+def _job_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.job_id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+async def _submit_job(
+    kind: str, params: dict, source: Optional[BinaryIO] = None, filename: Optional[str] = None
+) -> JobResponse:
+    store = get_state().job_store
+    input_path = input_digest = None
+    if source is not None:
+        suffix = os.path.splitext(filename or "")[1]
+        input_path, input_digest = await run_in_threadpool(store.save_input, source, suffix)
+    job, created = await run_in_threadpool(store.submit, kind, params, input_path, input_digest)
+    if created:
+        logger.info(f"Job {job.job_id} ({kind}) queued")
+        jobs.notify_worker()
+    return _job_response(job)
+
+
+@router.post("/jobs/synthesize", response_model=JobResponse, status_code=202)
+async def submit_synthesize_job(
+    text: str = Form(...),
+    voice_id: str = Form(...),
+    language: str = Form("English"),
+    expressiveness: float = Form(0.5),
+    similarity: float = Form(0.6),
+    seed: Optional[int] = Form(None),
+):
+    """Queue a synthesis job; poll /jobs/{job_id} and fetch the WAV from /jobs/{job_id}/result."""
+    translation.validate_language(language)
+    voice = get_state().voice_store.get(voice_id)
+    if voice is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired voice_id. Upload the voice reference again.")
+    params = {
+        "text": text,
+        "voice_id": voice_id,
+        "language": language,
+        "expressiveness": expressiveness,
+        "similarity": similarity,
+        "seed": seed,
+    }
+    # Queued jobs can outlive the voice store entry, so the job keeps its own
+    # copy of the reference audio
+    try:
+        reference = await run_in_threadpool(open, voice.path, "rb")
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="Unknown or expired voice_id. Upload the voice reference again.") from exc
+    with reference:
+        return await _submit_job("synthesize", params, reference, voice.path)
+
+
+@router.post("/jobs/translate", response_model=JobResponse, status_code=202)
+async def submit_translate_job(
+    audio: UploadFile = File(...),
+    translate_to: str = Form(...),
+):
+    """Queue a translation job; the result is the /translate JSON body."""
+    translation.validate_language(translate_to)
+    return await _submit_job("translate", {"translate_to": translate_to}, audio.file, audio.filename)
+
+
+@router.post("/jobs/apply-effects", response_model=JobResponse, status_code=202)
+async def submit_effects_job(
+    audio: UploadFile = File(...),
+    effects: str = Form("{}"),
+):
+    """Queue an effects render job; the result is a float32 WAV."""
+    try:
+        effects_config = json.loads(effects or "{}")
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail="Invalid effects payload") from exc
+    return await _submit_job("effects", {"effects": effects_config}, audio.file, audio.filename)
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Return a job's status and progress (0-1)."""
+    job = get_state().job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Download a finished job's result; 409 while it is still queued or running."""
+    job = get_state().job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+    if job.status != DONE:
+        detail = f"Job {job.status}" + (f": {job.error}" if job.error else "")
+        raise HTTPException(status_code=409, detail=detail)
+    return FileResponse(job.result_path, media_type=job.media_type)
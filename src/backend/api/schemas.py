@@ -1,11 +1,29 @@
 from pydantic import BaseModel
 
 
+class TranslationSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+
 class TranslationResponse(BaseModel):
     translated_text: str
+    segments: list[TranslationSegment] = []
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    progress: float
+    error: str | None = None
+    created_at: float
+    updated_at: float
 
 
 class StatusResponse(BaseModel):
     status: str
     path: str | None = None
+    voice_id: str | None = None
 
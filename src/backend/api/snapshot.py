@@ -0,0 +1,155 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import torch
+import transformers
+from huggingface_hub import scan_cache_dir, snapshot_download
+from huggingface_hub.errors import CacheNotFound
+from transformers import AutoProcessor, SeamlessM4Tv2ForSpeechToText
+
+logger = logging.getLogger(__name__)
+
+# Prepared models written at image build time by running this file; loads
+# fall back to the Hugging Face cache when unset or unusable. Only the model
+# libraries are imported so it can run before the backend is in the image.
+MODEL_SNAPSHOT_DIR = os.getenv("MODEL_SNAPSHOT_DIR")
+
+SEAMLESS_REPO = "facebook/seamless-m4t-v2-large"
+CHATTERBOX_REPO = "ResembleAI/chatterbox"
+SNAPSHOT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def _dtype_name(dtype: torch.dtype) -> str:
+    return str(dtype).removeprefix("torch.")
+
+
+def write_snapshot(root: Path, dtype: torch.dtype) -> None:
+    """Write a snapshot to ``root``, replacing any existing one atomically.
+
+    SeamlessM4T is saved as safetensors already cast to ``dtype``. Chatterbox
+    builds its modules in code and loads its checkpoint files by name, so
+    the manifest records its directory in the Hugging Face cache instead.
+    """
+    root = Path(root)
+    tmp = root.with_name(root.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    t0 = time.time()
+    # Only the speech-to-text half of the checkpoint is kept, cast once here
+    # rather than on every start
+    processor = AutoProcessor.from_pretrained(SEAMLESS_REPO)
+    model = SeamlessM4Tv2ForSpeechToText.from_pretrained(SEAMLESS_REPO, torch_dtype=dtype, low_cpu_mem_usage=True)
+    model.save_pretrained(tmp / "seamless", safe_serialization=True)
+    processor.save_pretrained(tmp / "seamless")
+    del model
+    logger.info(f"SeamlessM4T snapshot written in {time.time() - t0:.1f}s")
+
+    # Downloaded by ChatterboxMultilingualTTS.from_pretrained in an earlier step
+    chatterbox_dir = snapshot_download(CHATTERBOX_REPO, local_files_only=True)
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "dtype": _dtype_name(dtype),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "seamless_dir": "seamless",
+        "chatterbox_dir": str(Path(chatterbox_dir).resolve()),
+        "created_at": time.time(),
+    }
+    (tmp / MANIFEST).write_text(json.dumps(manifest, indent=2))
+    shutil.rmtree(root, ignore_errors=True)
+    tmp.rename(root)
+    logger.info(f"Model snapshot written to {root}")
+
+
+def load_manifest(root: Optional[str] = MODEL_SNAPSHOT_DIR) -> Optional[dict]:
+    """Return the snapshot manifest, or None when there is no usable snapshot."""
+    if not root:
+        return None
+    path = Path(root) / MANIFEST
+    try:
+        manifest = json.loads(path.read_text())
+    except FileNotFoundError:
+        logger.warning(f"No model snapshot at {root}; loading from the Hugging Face cache")
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring model snapshot with version {manifest.get('version')}")
+        return None
+    return manifest
+
+
+def seamless_source(dtype: torch.dtype, root: Optional[str] = MODEL_SNAPSHOT_DIR) -> str:
+    """Where to load SeamlessM4T from: the snapshot if it matches ``dtype``, else the Hub repo."""
+    manifest = load_manifest(root)
+    if manifest is None:
+        return SEAMLESS_REPO
+    if manifest["dtype"] != _dtype_name(dtype):
+        logger.warning(f"Model snapshot is {manifest['dtype']}, serving needs {_dtype_name(dtype)}; not using it")
+        return SEAMLESS_REPO
+    return str(Path(root) / manifest["seamless_dir"])
+
+
+def chatterbox_dir(root: Optional[str] = MODEL_SNAPSHOT_DIR) -> Optional[Path]:
+    manifest = load_manifest(root)
+    if manifest is None:
+        return None
+    path = Path(manifest["chatterbox_dir"])
+    if not path.is_dir():
+        logger.warning(f"Chatterbox checkpoint missing at {path}")
+        return None
+    return path
+
+
+def load_checkpoint(path: Path) -> Any:
+    """Load a torch checkpoint onto the CPU, memory-mapped so weights are paged
+    in as they are copied into the model rather than read into a second copy."""
+    try:
+        return torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+    except RuntimeError:
+        # Legacy (non-zip) checkpoints cannot be memory-mapped
+        return torch.load(path, map_location="cpu", weights_only=True)
+
+
+def prune_hub_cache(repo_id: str) -> None:
+    """Delete every cached revision of ``repo_id`` from the Hugging Face cache."""
+    try:
+        cache = scan_cache_dir()
+    except CacheNotFound:
+        return
+    revisions = [rev.commit_hash for repo in cache.repos if repo.repo_id == repo_id for rev in repo.revisions]
+    if not revisions:
+        return
+    strategy = cache.delete_revisions(*revisions)
+    strategy.execute()
+    logger.info(f"Removed {repo_id} from the Hugging Face cache ({strategy.expected_freed_size_str})")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Write a prepared model snapshot for fast cold starts.")
+    parser.add_argument("--output", default=MODEL_SNAPSHOT_DIR, help="Snapshot directory (default: MODEL_SNAPSHOT_DIR)")
+    parser.add_argument(
+        "--dtype",
+        choices=("float16", "float32"),
+        default="float16",
+        help="Serving dtype: float16 for GPU hosts, float32 for CPU",
+    )
+    parser.add_argument(
+        "--prune-cache",
+        action="store_true",
+        help="Delete the cached SeamlessM4T checkpoint once the snapshot holds it",
+    )
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("--output or MODEL_SNAPSHOT_DIR is required")
+    write_snapshot(Path(args.output), getattr(torch, args.dtype))
+    if args.prune_cache:
+        prune_hub_cache(SEAMLESS_REPO)
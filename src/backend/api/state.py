@@ -1,9 +1,28 @@
 import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
 from typing import Optional
 
 import torch
 from transformers import AutoProcessor, SeamlessM4Tv2ForSpeechToText
-from chatterbox.mtl_tts import ChatterboxMultilingualTTS
+from chatterbox.models.s3gen import S3Gen
+from chatterbox.models.t3 import T3
+from chatterbox.models.t3.modules.t3_config import T3Config
+from chatterbox.models.tokenizers import MTLTokenizer
+from chatterbox.models.voice_encoder import VoiceEncoder
+from chatterbox.mtl_tts import ChatterboxMultilingualTTS, Conditionals
+from safetensors.torch import load_file as load_safetensors
+
+from api import snapshot
+from api.executor import InferenceExecutor
+from api.optimization import CPU_OPTIMIZATIONS, CpuOptimizer
+from api.residency import ResidencyManager, module_bytes
+from voice_services.conditioning_cache import ConditioningCache
+from voice_services.job_store import JobStore
+from voice_services.result_cache import SynthesisCache
+from voice_services.voice_store import VoiceStore
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +37,29 @@ def _resolve_device() -> str:
 
 DEVICE = _resolve_device()
 
+CONDITIONING_CACHE_ENTRIES = int(os.getenv("CONDITIONING_CACHE_ENTRIES", "16"))
+CONDITIONING_CACHE_MB = int(os.getenv("CONDITIONING_CACHE_MB", "256"))
+VOICE_STORE_DIR = Path(os.getenv("VOICE_STORE_DIR", Path(tempfile.gettempdir()) / "lyre-voices"))
+VOICE_STORE_TTL_SECONDS = float(os.getenv("VOICE_STORE_TTL_SECONDS", "3600"))
+VOICE_STORE_MAX_ENTRIES = int(os.getenv("VOICE_STORE_MAX_ENTRIES", "64"))
+# Result caching is opt-in: set a directory to enable it
+SYNTHESIS_CACHE_DIR = os.getenv("SYNTHESIS_CACHE_DIR")
+SYNTHESIS_CACHE_MB = int(os.getenv("SYNTHESIS_CACHE_MB", "1024"))
+# Async jobs; point JOBS_DIR at persistent storage for jobs to survive redeploys
+JOBS_DIR = Path(os.getenv("JOBS_DIR", Path(tempfile.gettempdir()) / "lyre-jobs"))
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "86400"))
+SEAMLESS_CONCURRENCY = int(os.getenv("SEAMLESS_CONCURRENCY", "1"))
+SEAMLESS_MAX_QUEUE = int(os.getenv("SEAMLESS_MAX_QUEUE", "8"))
+CHATTERBOX_CONCURRENCY = int(os.getenv("CHATTERBOX_CONCURRENCY", "1"))
+CHATTERBOX_MAX_QUEUE = int(os.getenv("CHATTERBOX_MAX_QUEUE", "8"))
+# Residency: offload models idle this long ("cpu" or "unload"); unset keeps them pinned
+MODEL_IDLE_SECONDS = float(os.getenv("MODEL_IDLE_SECONDS", "0")) or None
+MODEL_IDLE_OFFLOAD = os.getenv("MODEL_IDLE_OFFLOAD", "cpu")
+MODEL_MEMORY_BUDGET_GB = float(os.getenv("MODEL_MEMORY_BUDGET_GB", "0")) or None
+
+# Use fp16 on GPU for lower memory usage
+MODEL_DTYPE = torch.float16 if DEVICE in ("cuda", "mps") else torch.float32
+
 
 _original_torch_load = torch.load
 
@@ -43,40 +85,139 @@ def _log_memory():
 
 class AppState:
     def __init__(self):
-        self.voice_reference_path: Optional[str] = None
+        self.conditioning_cache = ConditioningCache(
+            max_entries=CONDITIONING_CACHE_ENTRIES,
+            max_bytes=CONDITIONING_CACHE_MB * 1024 * 1024,
+        )
+        self.voice_store = VoiceStore(
+            VOICE_STORE_DIR,
+            ttl_seconds=VOICE_STORE_TTL_SECONDS,
+            max_entries=VOICE_STORE_MAX_ENTRIES,
+            on_evict=self.conditioning_cache.discard,
+        )
+        self.synthesis_cache: Optional[SynthesisCache] = None
+        if SYNTHESIS_CACHE_DIR:
+            self.synthesis_cache = SynthesisCache(
+                Path(SYNTHESIS_CACHE_DIR), max_bytes=SYNTHESIS_CACHE_MB * 1024 * 1024
+            )
+        self.job_store = JobStore(JOBS_DIR, ttl_seconds=JOB_TTL_SECONDS)
+        self.executors = {
+            "seamless": InferenceExecutor("seamless", SEAMLESS_CONCURRENCY, SEAMLESS_MAX_QUEUE),
+            "chatterbox": InferenceExecutor("chatterbox", CHATTERBOX_CONCURRENCY, CHATTERBOX_MAX_QUEUE),
+        }
+        # Chatterbox keeps the active conditionals on the model, so generation
+        # with a given voice must not interleave with another request.
+        self.chatterbox_lock = threading.Lock()
         self.seamless_model: Optional[SeamlessM4Tv2ForSpeechToText] = None
         self.seamless_processor: Optional[AutoProcessor] = None
         self.chatterbox: Optional[ChatterboxMultilingualTTS] = None
+        self.models_ready = False
+        self.cpu_optimizer = CpuOptimizer(DEVICE, CPU_OPTIMIZATIONS)
+        self.residency = ResidencyManager(
+            DEVICE,
+            idle_seconds=MODEL_IDLE_SECONDS,
+            offload=MODEL_IDLE_OFFLOAD,
+            budget_bytes=int(MODEL_MEMORY_BUDGET_GB * 1e9) if MODEL_MEMORY_BUDGET_GB else None,
+        )
 
     def load_models(self) -> None:
-        if self.seamless_model and self.chatterbox:
+        if self.models_ready:
             return
 
-        # Use fp16 on GPU for lower memory usage
-        use_fp16 = DEVICE in ("cuda", "mps")
-        dtype = torch.float16 if use_fp16 else torch.float32
-        
-        logger.info(f"Loading models on {DEVICE} (dtype={dtype})")
+        logger.info(f"Loading models on {DEVICE} (dtype={MODEL_DTYPE})")
+        self.residency.register("seamless", self._load_seamless, self._move_seamless, self._unload_seamless)
+        self.residency.register("chatterbox", self._load_chatterbox, self._move_chatterbox, self._unload_chatterbox)
+        for name in ("seamless", "chatterbox"):
+            with self.residency.use(name):
+                pass
+        self.residency.start()
+        self.models_ready = True
+
+        logger.info("All models loaded successfully")
 
-        # Load SeamlessM4T with low_cpu_mem_usage for faster loading
-        self.seamless_processor = AutoProcessor.from_pretrained("facebook/seamless-m4t-v2-large")
+    def _load_seamless(self) -> int:
+        # Load SeamlessM4T with low_cpu_mem_usage for faster loading; a
+        # snapshot is already in MODEL_DTYPE and memory-mapped
+        source = snapshot.seamless_source(MODEL_DTYPE)
+        self.seamless_processor = AutoProcessor.from_pretrained(source)
         self.seamless_model = SeamlessM4Tv2ForSpeechToText.from_pretrained(
-            "facebook/seamless-m4t-v2-large",
-            torch_dtype=dtype,
+            source,
+            torch_dtype=MODEL_DTYPE,
             low_cpu_mem_usage=True,
         ).to(DEVICE)
+        self.seamless_model = self.cpu_optimizer.prepare(self.seamless_model)
         
         logger.info("SeamlessM4T loaded")
         _log_memory()
-
-        # Load Chatterbox
-        self.chatterbox = ChatterboxMultilingualTTS.from_pretrained(device=DEVICE)
+        return module_bytes(self.seamless_model)
+
+    def _move_seamless(self, device: str) -> None:
+        self.seamless_model.to(device)
+
+    def _unload_seamless(self) -> None:
+        self.seamless_model = None
+        self.seamless_processor = None
+
+    def _load_chatterbox(self) -> int:
+        ckpt_dir = snapshot.chatterbox_dir()
+        if ckpt_dir is not None:
+            self.chatterbox = _chatterbox_from_snapshot(ckpt_dir, DEVICE)
+        else:
+            self.chatterbox = ChatterboxMultilingualTTS.from_pretrained(device=DEVICE)
+        # Chatterbox's alignment analyzer reads attention weights, which
+        # only the eager implementation returns
         self.chatterbox.t3.tfmr.config._attn_implementation = "eager"
+        # Only the Llama backbone is quantized and compiled: T3 reads its
+        # device from speech_head.weight, which a quantized Linear lacks
+        t3 = self.chatterbox.t3
+        t3.tfmr = self.cpu_optimizer.prepare(t3.tfmr)
+        # Only T3 token generation runs in bf16; S3Gen's vocoder uses complex
+        # ops (istft) that have no bf16 kernels, so it stays float32
+        self.chatterbox.t3.inference = self.cpu_optimizer.autocast_calls(self.chatterbox.t3.inference)
         
         logger.info("Chatterbox loaded")
         _log_memory()
-        
-        logger.info("All models loaded successfully")
+        return module_bytes(self.chatterbox.t3, self.chatterbox.s3gen, self.chatterbox.ve)
+
+    def _move_chatterbox(self, device: str) -> None:
+        chatterbox = self.chatterbox
+        for module in (chatterbox.t3, chatterbox.s3gen, chatterbox.ve):
+            module.to(device)
+        chatterbox.device = device
+        if chatterbox.conds is not None:
+            chatterbox.conds.to(device)
+        # Otherwise cached conditionals keep holding device memory after offload
+        self.conditioning_cache.to(device)
+
+    def _unload_chatterbox(self) -> None:
+        self.chatterbox = None
+        # Cached conditionals live on the device of the model that made them
+        self.conditioning_cache.clear()
+
+
+def _chatterbox_from_snapshot(ckpt_dir: Path, device: str) -> ChatterboxMultilingualTTS:
+    """ChatterboxMultilingualTTS.from_local, but with the torch checkpoints
+    memory-mapped. Skips the Hub lookup that from_pretrained makes."""
+    ve = VoiceEncoder()
+    ve.load_state_dict(snapshot.load_checkpoint(ckpt_dir / "ve.pt"))
+    ve.to(device).eval()
+
+    t3 = T3(T3Config.multilingual())
+    t3_state = load_safetensors(ckpt_dir / "t3_mtl23ls_v2.safetensors")
+    if "model" in t3_state.keys():
+        t3_state = t3_state["model"][0]
+    t3.load_state_dict(t3_state)
+    t3.to(device).eval()
+
+    s3gen = S3Gen()
+    s3gen.load_state_dict(snapshot.load_checkpoint(ckpt_dir / "s3gen.pt"))
+    s3gen.to(device).eval()
+
+    tokenizer = MTLTokenizer(str(ckpt_dir / "grapheme_mtl_merged_expanded_v1.json"))
+    conds = None
+    if (builtin_voice := ckpt_dir / "conds.pt").exists():
+        conds = Conditionals.load(builtin_voice).to(device)
+    return ChatterboxMultilingualTTS(t3, s3gen, ve, tokenizer, device, conds=conds)
 
 
 _state = AppState()
@@ -19,17 +19,24 @@ logging.getLogger("httpcore").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+from api import metrics, profiling
 from api.routes import router
 from api.state import get_state
+from voice_services import jobs
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     state = get_state()
+    metrics.register_state(state)
     state.load_models()
+    jobs.start_worker()
     yield
-    # Shutdown (nothing to clean up)
+    # Shutdown
+    await jobs.stop_worker()
+    for executor in state.executors.values():
+        executor.shutdown()
 
 
 def create_app() -> FastAPI:
@@ -42,8 +49,14 @@ def create_app() -> FastAPI:
         allow_origins=allowed_origins,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing", "X-Translated-Text", "X-Voice-Id", "X-Queue-Position", "X-Profile-Id"],
     )
+    if profiling.PROFILE_TOKEN:
+        app.add_middleware(profiling.ProfilingMiddleware)
+    app.add_middleware(metrics.MetricsMiddleware)
     app.include_router(router)
+    # Served outside /api so the public proxy never forwards it
+    app.add_route("/metrics", metrics.metrics_endpoint, include_in_schema=False)
     return app
 
 
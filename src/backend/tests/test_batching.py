@@ -0,0 +1,73 @@
+import asyncio
+
+from voice_services.batching import MicroBatcher
+
+
+def test_concurrent_requests_are_batched_per_group():
+    calls = []
+
+    async def run_batch(group, payloads):
+        calls.append((group, list(payloads)))
+        return [f"{group}:{p}" for p in payloads]
+
+    async def scenario():
+        batcher = MicroBatcher("test", run_batch, max_batch_size=8, max_wait_ms=50)
+        return await asyncio.gather(
+            batcher.submit(1, "a"),
+            batcher.submit(2, "b"),
+            batcher.submit(3, "a"),
+        )
+
+    results = asyncio.run(scenario())
+
+    assert results == ["a:1", "b:2", "a:3"]
+    assert sorted(calls) == [("a", [1, 3]), ("b", [2])]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+
+    async def run_batch(group, payloads):
+        sizes.append(len(payloads))
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher("test", run_batch, max_batch_size=2, max_wait_ms=50)
+        return await asyncio.gather(*(batcher.submit(i, "a") for i in range(5)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    assert sorted(sizes) == [1, 2, 2]
+
+
+def test_batch_failure_is_raised_to_every_caller():
+    async def run_batch(group, payloads):
+        raise RuntimeError("model failed")
+
+    async def scenario():
+        batcher = MicroBatcher("test", run_batch, max_batch_size=4, max_wait_ms=20)
+        return await asyncio.gather(batcher.submit(1, "a"), batcher.submit(2, "a"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_batcher_recovers_on_a_new_event_loop():
+    async def run_batch(group, payloads):
+        return payloads
+
+    batcher = MicroBatcher("test", run_batch, max_wait_ms=1)
+
+    assert asyncio.run(batcher.submit("x", "a")) == "x"
+    assert asyncio.run(batcher.submit("y", "a")) == "y"
+
+
+def test_wait_window_closes_without_more_requests():
+    async def run_batch(group, payloads):
+        return payloads
+
+    async def scenario():
+        batcher = MicroBatcher("test", run_batch, max_batch_size=8, max_wait_ms=10)
+        return await asyncio.wait_for(batcher.submit("only", "a"), timeout=1)
+
+    assert asyncio.run(scenario()) == "only"
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from voice_services import realtime_effects
+from voice_services.effects_session import EffectsSession
+
+SR = 24000
+
+
+def clip(seconds: float = 6) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    envelope = 1 + np.sin(2 * np.pi * 0.5 * t)
+    return (0.3 * np.sin(2 * np.pi * 220 * t) * envelope).astype(np.float32)[None]
+
+
+def render_all(session: EffectsSession, start_seconds: float = 0.0) -> np.ndarray:
+    out = np.full_like(session.audio, np.nan)
+    for offset, block in session.render(start_seconds):
+        out[:, offset : offset + block.shape[-1]] = block
+    return out
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"reverb": {}, "delay": {}, "chorus": {}},
+        {"compressor": {}, "lowpass": {}, "limiter": {}},
+        # Rendered over the whole range rather than in blocks
+        {"pitch_shift": {"semitones": 3}},
+        {"gsm": {}},
+        {"reverb": {}, "pitch_shift": {"semitones": -4}, "delay": {}},
+    ],
+)
+def test_session_render_matches_whole_buffer_effects(config):
+    audio = clip()
+    session = EffectsSession(audio, SR, block_frames=8192)
+    session.set_effects(config)
+
+    expected = realtime_effects.apply_effects(audio, SR, config)
+
+    np.testing.assert_allclose(render_all(session), expected, atol=1e-5)
+
+
+def test_render_from_playhead_covers_the_whole_clip():
+    audio = clip()
+    session = EffectsSession(audio, SR, block_frames=8192)
+    session.set_effects({"gain": {"gain_db": -6}})
+
+    offsets = [offset for offset, _ in session.render(3.0)]
+    out = render_all(session, 3.0)
+
+    assert offsets[0] == 3 * SR
+    np.testing.assert_allclose(out, realtime_effects.apply_effects(audio, SR, {"gain": {"gain_db": -6}}), atol=1e-5)
+
+
+def test_parameter_change_updates_plugin_in_place():
+    session = EffectsSession(clip(1), SR)
+    session.set_effects({"reverb": {"room_size": 0.2}})
+    board, plugin = session.board, session.board[0]
+
+    session.set_effects({"reverb": {"room_size": 0.8}})
+
+    assert session.board is board and session.board[0] is plugin
+    assert plugin.room_size == pytest.approx(0.8, abs=0.01)
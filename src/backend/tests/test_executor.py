@@ -0,0 +1,60 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from api.executor import InferenceExecutor
+
+
+def test_cancelled_caller_keeps_slot_until_work_finishes():
+    executor = InferenceExecutor("test", max_concurrency=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(work))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The thread is still running, so the single slot is still taken
+        assert executor.stats()["running"] == 1
+        with pytest.raises(HTTPException):
+            executor.check_capacity()
+        release.set()
+        await asyncio.sleep(0.1)
+        assert executor.stats()["running"] == 0
+
+    asyncio.run(scenario())
+    executor.shutdown()
+
+
+def test_cancelled_reserved_work_is_counted_until_it_finishes():
+    executor = InferenceExecutor("test", max_concurrency=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+
+    async def run_reserved():
+        with executor.reservation():
+            await executor.run(work, reserved=True)
+
+    async def scenario():
+        task = asyncio.create_task(run_reserved())
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert executor.stats()["running"] == 1
+        release.set()
+        await asyncio.sleep(0.1)
+        assert executor.stats()["running"] == 0
+
+    asyncio.run(scenario())
+    executor.shutdown()
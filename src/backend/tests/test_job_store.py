@@ -0,0 +1,111 @@
+import io
+import time
+from pathlib import Path
+
+from voice_services.job_store import DONE, FAILED, QUEUED, RUNNING, JobStore
+
+
+def test_identical_requests_share_a_job(tmp_path):
+    store = JobStore(tmp_path)
+    path, digest = store.save_input(io.BytesIO(b"clip"))
+
+    job, created = store.submit("translate", {"language": "French"}, path, digest)
+    again, created_again = store.submit("translate", {"language": "French"}, path, digest)
+    other, created_other = store.submit("translate", {"language": "German"}, path, digest)
+
+    assert created and not created_again and created_other
+    assert again.job_id == job.job_id
+    assert other.job_id != job.job_id
+
+
+def test_save_input_is_content_addressed(tmp_path):
+    store = JobStore(tmp_path)
+
+    first = store.save_input(io.BytesIO(b"same bytes"))
+    second = store.save_input(io.BytesIO(b"same bytes"))
+
+    assert first == second
+    assert Path(first[0]).read_bytes() == b"same bytes"
+    assert [p.name for p in store.inputs_dir.iterdir()] == [Path(first[0]).name]
+
+
+def test_save_input_keeps_the_upload_extension(tmp_path):
+    store = JobStore(tmp_path)
+
+    mp3, digest = store.save_input(io.BytesIO(b"clip"), ".MP3")
+    unsafe, _ = store.save_input(io.BytesIO(b"clip"), "./../x")
+
+    assert Path(mp3).name == f"{digest}.mp3"
+    assert Path(unsafe).name == digest
+
+
+def test_jobs_run_in_submission_order(tmp_path):
+    store = JobStore(tmp_path)
+    first, _ = store.submit("effects", {"n": 1})
+    second, _ = store.submit("effects", {"n": 2})
+
+    claimed = store.claim_next()
+    assert claimed.job_id == first.job_id and claimed.status == RUNNING
+    assert store.claim_next().job_id == second.job_id
+    assert store.claim_next() is None
+
+
+def test_failed_job_is_requeued_on_resubmit(tmp_path):
+    store = JobStore(tmp_path)
+    job, _ = store.submit("effects", {"n": 1})
+    store.claim_next()
+    store.fail(job.job_id, "boom")
+    assert store.get(job.job_id).status == FAILED
+
+    again, created = store.submit("effects", {"n": 1})
+
+    assert created and again.job_id == job.job_id
+    assert again.status == QUEUED and again.error is None
+
+
+def test_running_jobs_are_requeued_after_restart(tmp_path):
+    store = JobStore(tmp_path)
+    job, _ = store.submit("effects", {"n": 1})
+    store.claim_next()
+    store.set_progress(job.job_id, 0.5)
+    store.close()
+
+    restarted = JobStore(tmp_path)
+    recovered = restarted.get(job.job_id)
+
+    assert recovered.status == QUEUED and recovered.progress == 0
+    assert restarted.counts() == {QUEUED: 1}
+
+
+def test_cleanup_removes_expired_jobs_and_unshared_files(tmp_path):
+    store = JobStore(tmp_path, ttl_seconds=60)
+    path, digest = store.save_input(io.BytesIO(b"clip"))
+    old, _ = store.submit("effects", {"n": 1}, path, digest)
+    live, _ = store.submit("effects", {"n": 2}, path, digest)
+    result = store.results_dir / f"{old.job_id}.wav"
+    result.write_bytes(b"audio")
+    store.complete(old.job_id, str(result), "audio/wav")
+    store._db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 120, old.job_id))
+
+    assert store.cleanup() == 1
+    assert store.get(old.job_id) is None
+    assert not result.exists()
+    # Still referenced by the live job
+    assert Path(path).exists()
+
+    store.complete(live.job_id, str(result), "audio/wav")
+    store._db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 120, live.job_id))
+    assert store.cleanup() == 1
+    assert not Path(path).exists()
+    assert store.counts() == {}
+
+
+def test_complete_records_result(tmp_path):
+    store = JobStore(tmp_path)
+    job, _ = store.submit("effects", {"n": 1})
+
+    store.complete(job.job_id, "/results/x.wav", "audio/wav")
+    done = store.get(job.job_id)
+
+    assert done.status == DONE and done.progress == 1
+    assert done.result_path == "/results/x.wav" and done.media_type == "audio/wav"
@@ -0,0 +1,32 @@
+import torch
+
+from api import optimization
+from api.optimization import CpuOptimizer, parse_cpu_optimizations
+
+
+def test_parse_ignores_unknown_flags():
+    assert parse_cpu_optimizations(" INT8, bf16,,turbo ") == {"int8", "bf16"}
+    assert parse_cpu_optimizations("") == set()
+
+
+def test_optimizations_only_apply_on_cpu():
+    assert CpuOptimizer("cuda", {"int8", "compile"}).flags == set()
+
+
+def test_int8_disables_bf16(monkeypatch):
+    monkeypatch.setattr(optimization, "cpu_supports_bf16", lambda: True)
+
+    assert CpuOptimizer("cpu", {"bf16"}).bf16
+    combined = CpuOptimizer("cpu", {"int8", "bf16"})
+    assert not combined.bf16 and combined.flags == {"int8"}
+
+
+def test_int8_quantized_module_runs_float32_input():
+    model = torch.nn.Sequential(torch.nn.Linear(16, 16), torch.nn.ReLU(), torch.nn.Linear(16, 4))
+    x = torch.randn(2, 16)
+    expected = model(x)
+
+    quantized = CpuOptimizer("cpu", {"int8"}).prepare(model)
+
+    assert isinstance(quantized[0], torch.ao.nn.quantized.dynamic.Linear)
+    assert torch.allclose(quantized(x), expected, atol=0.05)
@@ -0,0 +1,176 @@
+import threading
+
+import torch
+
+from api.residency import ON_CPU, ON_DEVICE, UNLOADED, ResidencyManager, module_bytes
+
+
+class FakeModel:
+    """Records the residency callbacks made for one registered model."""
+
+    def __init__(self, manager: ResidencyManager, name: str, size: int = 100):
+        self.size = size
+        self.calls = []
+        manager.register(name, self.load, self.move, self.unload)
+
+    def load(self) -> int:
+        self.calls.append("load")
+        return self.size
+
+    def move(self, device: str) -> None:
+        self.calls.append(f"move:{device}")
+
+    def unload(self) -> None:
+        self.calls.append("unload")
+
+
+def residency(manager: ResidencyManager, name: str) -> str:
+    return manager.stats()[name]["residency"]
+
+
+def age(manager: ResidencyManager, name: str, seconds: float) -> None:
+    manager._slots[name].last_used -= seconds
+
+
+def test_idle_model_is_offloaded_to_cpu_and_brought_back():
+    manager = ResidencyManager("cuda", idle_seconds=60)
+    model = FakeModel(manager, "seamless")
+
+    with manager.use("seamless"):
+        pass
+    assert residency(manager, "seamless") == ON_DEVICE
+
+    manager.sweep()
+    assert residency(manager, "seamless") == ON_DEVICE
+
+    age(manager, "seamless", 61)
+    manager.sweep()
+    assert residency(manager, "seamless") == ON_CPU
+
+    with manager.use("seamless"):
+        assert residency(manager, "seamless") == ON_DEVICE
+    assert model.calls == ["load", "move:cpu", "move:cuda"]
+
+
+def test_idle_model_on_cpu_host_is_unloaded_and_reloaded():
+    manager = ResidencyManager("cpu", idle_seconds=60)
+    model = FakeModel(manager, "chatterbox")
+
+    with manager.use("chatterbox"):
+        pass
+    age(manager, "chatterbox", 61)
+    manager.sweep()
+    assert residency(manager, "chatterbox") == UNLOADED
+
+    with manager.use("chatterbox"):
+        pass
+    assert model.calls == ["load", "unload", "load"]
+
+
+def test_sweep_skips_models_in_use():
+    manager = ResidencyManager("cuda", idle_seconds=60)
+    model = FakeModel(manager, "seamless")
+
+    with manager.use("seamless"):
+        age(manager, "seamless", 61)
+        manager.sweep()
+        assert residency(manager, "seamless") == ON_DEVICE
+    assert model.calls == ["load"]
+
+
+def test_budget_evicts_least_recently_used_idle_model():
+    manager = ResidencyManager("cuda", budget_bytes=250)
+    a = FakeModel(manager, "a")
+    b = FakeModel(manager, "b")
+    c = FakeModel(manager, "c")
+
+    with manager.use("a"):
+        pass
+    with manager.use("b"):
+        pass
+    age(manager, "b", 10)
+    with manager.use("a"):
+        pass
+    with manager.use("c"):
+        pass
+
+    assert residency(manager, "b") == ON_CPU
+    assert residency(manager, "a") == ON_DEVICE
+    assert residency(manager, "c") == ON_DEVICE
+    assert b.calls == ["load", "move:cpu"]
+    assert a.calls == ["load"] and c.calls == ["load"]
+
+
+def test_budget_never_evicts_a_model_in_use():
+    manager = ResidencyManager("cuda", budget_bytes=150)
+    a = FakeModel(manager, "a")
+    FakeModel(manager, "b")
+
+    with manager.use("a"):
+        with manager.use("b"):
+            assert residency(manager, "a") == ON_DEVICE
+            assert residency(manager, "b") == ON_DEVICE
+    assert a.calls == ["load"]
+
+
+def test_failed_load_leaves_model_unloaded():
+    manager = ResidencyManager("cuda")
+
+    def load() -> int:
+        raise RuntimeError("out of memory")
+
+    manager.register("broken", load, lambda device: None, lambda: None)
+
+    try:
+        with manager.use("broken"):
+            pass
+    except RuntimeError:
+        pass
+    assert residency(manager, "broken") == UNLOADED
+
+
+def test_concurrent_users_load_a_model_once():
+    manager = ResidencyManager("cuda")
+    loading = threading.Event()
+    proceed = threading.Event()
+    loads = []
+
+    def load() -> int:
+        loads.append(1)
+        loading.set()
+        proceed.wait(5)
+        return 100
+
+    manager.register("seamless", load, lambda device: None, lambda: None)
+
+    def worker():
+        with manager.use("seamless"):
+            pass
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    threads[0].start()
+    loading.wait(5)
+    for t in threads[1:]:
+        t.start()
+    # Status stays readable while the load runs outside the lock
+    assert residency(manager, "seamless") == "moving"
+    proceed.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(loads) == 1
+    assert manager.stats()["seamless"]["in_use"] == 0
+
+
+def test_module_bytes_counts_int8_packed_weights_and_tied_weights_once():
+    model = torch.nn.Sequential(torch.nn.Linear(64, 64), torch.nn.LayerNorm(64))
+    assert module_bytes(model) == (64 * 64 + 64 + 2 * 64) * 4
+
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    # int8 weight, float32 bias, and the float32 LayerNorm plus scale/zero point
+    assert module_bytes(quantized) >= 64 * 64 + (64 + 2 * 64) * 4
+
+    embedding = torch.nn.Embedding(10, 4)
+    head = torch.nn.Linear(4, 10, bias=False)
+    head.weight = embedding.weight
+    assert module_bytes(torch.nn.ModuleList([embedding, head])) == 10 * 4 * 4
@@ -0,0 +1,56 @@
+import numpy as np
+
+from voice_services.segmentation import split_on_silence
+
+SR = 16000
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(SR * seconds)) / SR
+    return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(SR * seconds), dtype=np.float32)
+
+
+def test_splits_at_pause_and_trims_silence():
+    audio = np.concatenate([silence(0.5), tone(5), silence(1), tone(5), silence(0.5)])
+
+    segments = split_on_silence(audio, SR, max_seconds=8)
+
+    assert [(s.start, s.end) for s in segments] == [(SR // 2, SR * 11 // 2), (SR * 13 // 2, SR * 23 // 2)]
+
+
+def test_short_clip_is_one_segment():
+    audio = np.concatenate([tone(3), silence(1), tone(3)])
+
+    segments = split_on_silence(audio, SR, max_seconds=20)
+
+    assert [(s.start, s.end) for s in segments] == [(0, len(audio))]
+
+
+def test_hard_cuts_speech_without_pauses():
+    audio = tone(25)
+
+    segments = split_on_silence(audio, SR, max_seconds=10)
+
+    assert all(s.end - s.start <= 10 * SR for s in segments)
+    assert segments[0].start == 0 and segments[-1].end == len(audio)
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:]))
+
+
+def test_keeps_partial_trailing_frame():
+    audio = tone(2.005)
+
+    segments = split_on_silence(audio, SR)
+
+    assert segments[-1].end == len(audio)
+
+
+def test_empty_clip_has_no_segments():
+    assert split_on_silence(np.zeros(0, dtype=np.float32), SR) == []
+
+
+def test_silent_clip_has_no_segments():
+    assert split_on_silence(silence(3), SR) == []
@@ -1,23 +1,205 @@
-import tempfile
-from typing import Tuple
+import logging
+import os
+import struct
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple, Union
 
 import numpy as np
+import torch
 import torchaudio
+from fastapi import HTTPException
+from torchcodec.decoders import AudioDecoder
+from torchcodec.encoders import AudioEncoder
 
+from api import metrics
 
-def save_upload_to_temp(upload: bytes) -> str:
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    tmp.write(upload)
-    tmp.close()
-    return tmp.name
+logger = logging.getLogger(__name__)
 
+# Response formats: "wav" is float32 WAV (the historical default), "pcm16"
+# is 16-bit WAV at half the size, "flac" is lossless, "opus" is Ogg/Opus.
+OUTPUT_FORMATS = {
+    "wav": "audio/wav",
+    "pcm16": "audio/wav",
+    "flac": "audio/flac",
+    "opus": "audio/ogg",
+}
+FILE_EXTENSIONS = {"wav": "wav", "pcm16": "wav", "flac": "flac", "opus": "ogg"}
+ACCEPT_FORMATS = {
+    "audio/wav": "wav",
+    "audio/wave": "wav",
+    "audio/x-wav": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+}
+# WAV codec parameters (RFC 2361): 1 is integer PCM, 3 is IEEE float
+WAV_CODECS = {"1": "pcm16", "3": "wav"}
+DEFAULT_OUTPUT_FORMAT = os.getenv("AUDIO_OUTPUT_FORMAT", "wav")
+if DEFAULT_OUTPUT_FORMAT not in OUTPUT_FORMATS:
+    logger.warning(f"Ignoring unknown AUDIO_OUTPUT_FORMAT {DEFAULT_OUTPUT_FORMAT!r}; using wav")
+    DEFAULT_OUTPUT_FORMAT = "wav"
+OPUS_BITRATE = int(os.getenv("OPUS_BITRATE", "64000"))
+# Rates libopus encodes natively; anything else is resampled to 48kHz
+OPUS_RATES = {8000, 12000, 16000, 24000, 48000}
 
-def load_audio(path: str, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
-    waveform, sr = torchaudio.load(str(path))
-    if waveform.shape[0] > 1:
-        waveform = waveform.mean(dim=0, keepdim=True)
-    if sr != target_sr:
-        waveform = torchaudio.transforms.Resample(sr, target_sr)(waveform)
-        sr = target_sr
-    return waveform.squeeze(0).numpy(), sr
 
+def decode_audio(raw: bytes) -> Tuple[torch.Tensor, int]:
+    """Decode an uploaded file (wav, webm, ogg, mp3, ...) straight from memory.
+
+    Returns a float32 ``(channels, frames)`` tensor and its sample rate.
+    """
+    with metrics.stage("decode"):
+        samples = AudioDecoder(raw).get_all_samples()
+    metrics.observe_input_audio(samples.data.shape[-1] / samples.sample_rate)
+    return samples.data, samples.sample_rate
+
+
+def encode_wav(audio: Union[torch.Tensor, np.ndarray], sr: int) -> bytes:
+    """Encode float audio as a float32 WAV in memory.
+
+    Accepts mono or ``(channels, frames)`` input; CPU tensors are viewed as
+    NumPy arrays without copying.
+    """
+    with metrics.stage("encode"):
+        if isinstance(audio, torch.Tensor):
+            audio = audio.detach().cpu().numpy()
+        num_channels = 1 if audio.ndim == 1 else audio.shape[0]
+        return wav_header(
+            sr, num_channels, bits_per_sample=32, num_frames=audio.shape[-1], float_format=True
+        ) + to_float32_bytes(audio)
+
+
+@lru_cache(maxsize=32)
+def get_resampler(orig_sr: int, target_sr: int, dtype: torch.dtype = torch.float32) -> torchaudio.transforms.Resample:
+    """Shared resampler per rate pair; building one recomputes its sinc kernel."""
+    return torchaudio.transforms.Resample(orig_sr, target_sr, dtype=dtype)
+
+
+def prepare_audio(waveform: torch.Tensor, sr: int, target_rates: Sequence[int]) -> Dict[int, torch.Tensor]:
+    """Downmix to mono once and resample to every requested rate.
+
+    Returns ``{rate: (1, frames) tensor}``; a rate equal to ``sr`` reuses
+    the downmixed tensor without copying.
+    """
+    with metrics.stage("resample"):
+        if waveform.shape[0] > 1:
+            waveform = waveform.mean(dim=0, keepdim=True)
+        return {
+            rate: waveform if rate == sr else get_resampler(sr, rate, waveform.dtype)(waveform)
+            for rate in target_rates
+        }
+
+
+def decode_and_prepare(raw: bytes, target_rates: Sequence[int]) -> Dict[int, torch.Tensor]:
+    """Decode an upload once and return mono versions at each target rate."""
+    waveform, sr = decode_audio(raw)
+    return prepare_audio(waveform, sr, target_rates)
+
+
+def load_audio(raw: bytes, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
+    waveform = decode_and_prepare(raw, (target_sr,))[target_sr]
+    return waveform.squeeze(0).numpy(), target_sr
+
+
+def wav_header(
+    sr: int,
+    num_channels: int = 1,
+    bits_per_sample: int = 16,
+    num_frames: Optional[int] = None,
+    float_format: bool = False,
+) -> bytes:
+    """Build a PCM (or IEEE float) WAV header. Without ``num_frames`` the sizes
+    are set to the maximum so players treat the file as an open-ended stream."""
+    format_tag = 3 if float_format else 1
+    block_align = num_channels * bits_per_sample // 8
+    if num_frames is None:
+        data_size = 0xFFFFFFFF - 36
+    else:
+        data_size = num_frames * block_align
+    return (
+        b"RIFF"
+        + struct.pack("<I", data_size + 36)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, format_tag, num_channels, sr, sr * block_align, block_align, bits_per_sample)
+        + b"data"
+        + struct.pack("<I", data_size)
+    )
+
+
+def to_pcm16_bytes(audio: np.ndarray) -> bytes:
+    """Convert float audio in [-1, 1] to little-endian interleaved PCM16."""
+    if audio.ndim == 2:
+        audio = audio.T
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def to_float32_bytes(audio: np.ndarray) -> bytes:
+    """Convert (channels, frames) or mono float audio to interleaved float32 bytes."""
+    if audio.ndim == 2:
+        audio = audio.T
+    return audio.astype("<f4", copy=False).tobytes()
+
+
+def negotiate_format(requested: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """Pick an output format from an explicit ``format`` value or an Accept header.
+
+    An explicit format wins and must be one of OUTPUT_FORMATS. Otherwise the
+    highest-weighted supported media type in ``accept`` is used, falling
+    back to AUDIO_OUTPUT_FORMAT; ``audio/wav;codecs=1`` selects pcm16.
+    """
+    if requested:
+        fmt = requested.strip().lower()
+        if fmt not in OUTPUT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported format: {requested}. Use one of {', '.join(OUTPUT_FORMATS)}",
+            )
+        return fmt
+
+    best, best_q = DEFAULT_OUTPUT_FORMAT, 0.0
+    for item in (accept or "").split(","):
+        media_type, *params = [part.strip().lower() for part in item.split(";")]
+        fmt = ACCEPT_FORMATS.get(media_type)
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+            elif param.startswith("codecs=") and fmt == "wav":
+                fmt = WAV_CODECS.get(param[7:].strip('"'))
+        if fmt and q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def encode_audio(
+    audio: Union[torch.Tensor, np.ndarray],
+    sr: int,
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> bytes:
+    """Encode float audio in memory as ``fmt`` (see OUTPUT_FORMATS)."""
+    if fmt == "wav":
+        return encode_wav(audio, sr)
+    with metrics.stage("encode"):
+        if isinstance(audio, np.ndarray):
+            audio = torch.from_numpy(audio)
+        audio = audio.detach().cpu().float()
+        if audio.ndim == 1:
+            audio = audio.unsqueeze(0)
+        if fmt == "pcm16":
+            samples = audio.numpy()
+            header = wav_header(sr, samples.shape[0], bits_per_sample=16, num_frames=samples.shape[-1])
+            return header + to_pcm16_bytes(samples)
+        encoder = AudioEncoder(audio, sample_rate=sr)
+        if fmt == "flac":
+            return encoder.to_tensor(format="flac").numpy().tobytes()
+        # FFmpeg's "opus" muxer writes Opus in an Ogg container
+        return encoder.to_tensor(
+            format="opus",
+            bit_rate=bitrate or OPUS_BITRATE,
+            sample_rate=sr if sr in OPUS_RATES else 48000,
+        ).numpy().tobytes()
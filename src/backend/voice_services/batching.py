@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _BatchItem:
+    payload: Any
+    group: str
+    future: asyncio.Future = field(repr=False)
+
+
+class MicroBatcher:
+    """Collects concurrent requests into batches for one model call.
+
+    The first request opens a window of ``max_wait_ms``; everything that
+    arrives before it closes (up to ``max_batch_size``) is grouped by its
+    ``group`` key and handed to ``run_batch(group, payloads)`` as a single
+    call. ``run_batch`` must return one result per payload, in order.
+
+    The batcher does no admission control of its own: callers hold an
+    executor reservation for each request while it waits here.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run_batch: Callable[[str, List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20,
+    ):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # The loop only keeps weak references to tasks; hold them until done
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(self, payload: Any, group: str) -> Any:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            # Batches serve many requests, so don't inherit this caller's context
+            self._worker = asyncio.create_task(self._collect(), context=contextvars.Context())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(_BatchItem(payload, group, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            groups: Dict[str, List[_BatchItem]] = defaultdict(list)
+            for item in batch:
+                groups[item.group].append(item)
+            for group, items in groups.items():
+                task = asyncio.create_task(self._dispatch(group, items))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, group: str, items: List[_BatchItem]) -> None:
+        logger.info(f"{self.name} batch: {len(items)} request(s) for {group}")
+        try:
+            results = await self.run_batch(group, [item.payload for item in items])
+        except Exception as exc:
+            for item in items:
+                if not item.future.done():
+                    item.future.set_exception(exc)
+            return
+        for item, result in zip(items, results):
+            if not item.future.done():
+                item.future.set_result(result)
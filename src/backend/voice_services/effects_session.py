@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from pedalboard import Pedalboard
+
+from voice_services import audio_handler
+from voice_services import realtime_effects
+
+logger = logging.getLogger(__name__)
+
+SESSION_BLOCK_FRAMES = int(os.getenv("EFFECTS_SESSION_BLOCK_FRAMES", "8192"))
+# Audio rendered and discarded before the playhead so reverb and delay
+# tails from earlier in the clip are already ringing when output starts
+SESSION_PREROLL_SECONDS = float(os.getenv("EFFECTS_SESSION_PREROLL_SECONDS", "2"))
+
+
+class EffectsSession:
+    """One client's clip and live pedalboard for interactive effect tweaking.
+
+    The clip is decoded once. Parameter changes are written to the existing
+    plugin objects, so a slider move costs an attribute update rather than
+    a board rebuild; adding, removing or reordering effects reuses the
+    plugins that are still present. Rendering runs block by block and can
+    start anywhere in the clip; chains with plugins that cannot stream
+    (see realtime_effects.WHOLE_BUFFER_PLUGINS) render each range in one call.
+    """
+
+    def __init__(
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        block_frames: int = SESSION_BLOCK_FRAMES,
+        preroll_seconds: float = SESSION_PREROLL_SECONDS,
+    ):
+        self.audio = np.ascontiguousarray(audio.reshape(-1, audio.shape[-1]), dtype=np.float32)
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.preroll_frames = int(preroll_seconds * sample_rate)
+        self.board = Pedalboard([])
+        self._key: Dict[str, Dict[str, float]] = {}
+        self._plugins: Dict[str, Any] = {}
+        self._chain: List[Any] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def decode(cls, raw: bytes, **kwargs: Any) -> "EffectsSession":
+        """Start a session from an encoded clip in any format decode_audio accepts."""
+        waveform, sr = audio_handler.decode_audio(raw)
+        return cls(waveform.numpy(), sr, **kwargs)
+
+    @property
+    def channels(self) -> int:
+        return self.audio.shape[0]
+
+    @property
+    def frames(self) -> int:
+        return self.audio.shape[-1]
+
+    def set_effects(self, config: Dict[str, Dict[str, float]]) -> None:
+        """Replace the whole effect chain, updating surviving plugins in place."""
+        key = realtime_effects.normalize_config(config)
+        with self._lock:
+            plugins = {}
+            for fx_name, values in key:
+                plugin = self._update_plugin(fx_name, values)
+                if plugin is not None:
+                    plugins[fx_name] = plugin
+            chain = list(plugins.values())
+            # Only reorders, additions, removals and rebuilt plugins need a new board
+            if len(chain) != len(self._chain) or any(a is not b for a, b in zip(chain, self._chain)):
+                self.board = Pedalboard(chain)
+            self._plugins, self._chain = plugins, chain
+            self._key = {fx_name: dict(values) for fx_name, values in key if fx_name in plugins}
+
+    def _update_plugin(self, fx_name: str, values: Tuple[Tuple[str, float], ...]) -> Any:
+        plugin = self._plugins.get(fx_name)
+        if plugin is None:
+            return realtime_effects.build_plugin(fx_name, values)
+        current = self._key.get(fx_name, {})
+        try:
+            for name, value in values:
+                if current.get(name) != value:
+                    setattr(plugin, name, value)
+        except Exception as exc:
+            # Not every parameter is writable on every plugin
+            logger.debug(f"Rebuilding {fx_name}: {exc}")
+            return realtime_effects.build_plugin(fx_name, values)
+        return plugin
+
+    def render(self, start_seconds: float = 0.0) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield ``(frame_offset, block)`` pairs covering the whole clip.
+
+        Rendering starts at ``start_seconds`` and runs to the end, then
+        wraps around to fill in the part before it, so audio at the
+        playhead is ready first.
+        """
+        start = min(max(int(start_seconds * self.sample_rate), 0), self.frames)
+        yield from self._render_range(start, self.frames)
+        if start > 0:
+            yield from self._render_range(0, start)
+
+    def _render_range(self, begin: int, end: int) -> Iterator[Tuple[int, np.ndarray]]:
+        if begin >= end:
+            return
+        pos = max(0, begin - self.preroll_frames)
+        processed = self._process_whole(pos, end)
+        if processed is not None:
+            for lo in range(begin, end, self.block_frames):
+                yield lo, processed[:, lo - pos : min(lo + self.block_frames, end) - pos]
+            return
+        # Output frame index of the next processed sample. Plugins with
+        # latency return short blocks at first; their output stays aligned
+        # with the input, so the shortfall is drained with silence at the end.
+        out_pos = pos
+        first = True
+        silence = np.zeros((self.channels, self.block_frames), dtype=np.float32)
+        while out_pos < end:
+            if pos < end:
+                block = self.audio[:, pos : min(pos + self.block_frames, end)]
+                pos += block.shape[-1]
+            elif pos - end < realtime_effects.STREAM_MAX_FLUSH_SECONDS * self.sample_rate:
+                block = silence
+                pos += block.shape[-1]
+            else:
+                break
+            processed = self._process(block, reset=first)
+            first = False
+            lo, hi = out_pos, out_pos + processed.shape[-1]
+            out_pos = hi
+            lo_clip, hi_clip = max(lo, begin), min(hi, end)
+            if hi_clip > lo_clip:
+                yield lo_clip, processed[:, lo_clip - lo : hi_clip - lo]
+
+    def _process_whole(self, begin: int, end: int) -> Optional[np.ndarray]:
+        """Render ``[begin, end)`` in one latency-compensated call, or None if the chain can stream."""
+        with self._lock:
+            if not realtime_effects.needs_whole_buffer(self._chain):
+                return None
+            return self.board(self.audio[:, begin:end], self.sample_rate, reset=True)
+
+    def _process(self, block: np.ndarray, reset: bool) -> np.ndarray:
+        with self._lock:
+            if reset:
+                self.board.reset()
+            return self.board(block, self.sample_rate, reset=False)
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    request_hash TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    input_path TEXT,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    result_path TEXT,
+    media_type TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+
+@dataclass
+class Job:
+    job_id: str
+    request_hash: str
+    kind: str
+    params: Dict[str, Any]
+    input_path: Optional[str]
+    status: str
+    progress: float
+    error: Optional[str]
+    result_path: Optional[str]
+    media_type: Optional[str]
+    created_at: float
+    updated_at: float
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            job_id=row["id"],
+            request_hash=row["request_hash"],
+            kind=row["kind"],
+            params=json.loads(row["params"]),
+            input_path=row["input_path"],
+            status=row["status"],
+            progress=row["progress"],
+            error=row["error"],
+            result_path=row["result_path"],
+            media_type=row["media_type"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+
+def request_hash(kind: str, params: Dict[str, Any], input_digest: Optional[str]) -> str:
+    # Key order is kept: effect chains are order-sensitive
+    payload = json.dumps([kind, params, input_digest], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class JobStore:
+    """SQLite-backed queue of long-running jobs with their inputs and results on disk.
+
+    Jobs are deduplicated by a hash of their kind, parameters and input
+    file, so resubmitting the same request returns the existing job. Inputs
+    are stored content-addressed under ``inputs/`` and results under
+    ``results/``. Jobs left running by a previous process are requeued on
+    start, and finished jobs older than ``ttl_seconds`` are deleted.
+    """
+
+    def __init__(self, root: Path, ttl_seconds: float = 86400):
+        self.root = Path(root)
+        self.inputs_dir = self.root / "inputs"
+        self.results_dir = self.root / "results"
+        self.inputs_dir.mkdir(parents=True, exist_ok=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._db = sqlite3.connect(self.root / "jobs.sqlite3", check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._recover()
+
+    def _recover(self) -> None:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), RUNNING),
+            )
+        if cur.rowcount:
+            logger.info(f"Requeued {cur.rowcount} job(s) interrupted by a restart")
+
+    def save_input(self, source: BinaryIO, suffix: str = "", chunk_size: int = 1024 * 1024) -> Tuple[str, str]:
+        """Copy an upload to the inputs directory while hashing it; returns (path, digest).
+
+        ``suffix`` (e.g. ``".mp3"``) is kept on the stored file so decoders
+        that go by the extension can still read it.
+        """
+        if not re.fullmatch(r"\.[A-Za-z0-9]{1,8}", suffix):
+            suffix = ""
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.inputs_dir, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                while chunk := source.read(chunk_size):
+                    digest.update(chunk)
+                    fh.write(chunk)
+            path = self.inputs_dir / f"{digest.hexdigest()}{suffix.lower()}"
+            os.replace(tmp_path, path)
+        except Exception:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        return str(path), digest.hexdigest()
+
+    def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        input_path: Optional[str] = None,
+        input_digest: Optional[str] = None,
+    ) -> Tuple[Job, bool]:
+        """Queue a job, or return the existing one for an identical request.
+
+        Returns ``(job, created)``. A previously failed identical job is
+        requeued rather than returned as failed.
+        """
+        key = request_hash(kind, params, input_digest)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE request_hash = ?", (key,)).fetchone()
+            if row is not None and row["status"] != FAILED:
+                return Job.from_row(row), False
+            if row is not None:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, progress = 0, error = NULL, updated_at = ? WHERE id = ?",
+                    (QUEUED, now, row["id"]),
+                )
+                job_id = row["id"]
+            else:
+                job_id = uuid.uuid4().hex
+                self._db.execute(
+                    "INSERT INTO jobs (id, request_hash, kind, params, input_path, status, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, key, kind, json.dumps(params), input_path, QUEUED, now, now),
+                )
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row is not None else None
+
+    def claim_next(self) -> Optional[Job]:
+        """Mark the oldest queued job as running and return it."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"])
+            )
+        return self.get(row["id"])
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET progress = ?, updated_at = ? WHERE id = ?",
+                (min(max(progress, 0.0), 1.0), time.time(), job_id),
+            )
+
+    def requeue(self, job_id: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (QUEUED, time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, result_path: str, media_type: str) -> None:
+        """Mark a job done once its result file under ``results/`` is fully written."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, progress = 1, result_path = ?, media_type = ?, updated_at = ?"
+                " WHERE id = ?",
+                (DONE, result_path, media_type, time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, error: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (FAILED, error, time.time(), job_id),
+            )
+
+    def cleanup(self) -> int:
+        """Delete finished jobs older than the TTL, with their results and unshared inputs."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, input_path, result_path FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, cutoff),
+            ).fetchall()
+            for row in rows:
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+            live_inputs = {r["input_path"] for r in self._db.execute("SELECT input_path FROM jobs")}
+        for row in rows:
+            if row["result_path"]:
+                Path(row["result_path"]).unlink(missing_ok=True)
+            if row["input_path"] and row["input_path"] not in live_inputs:
+                Path(row["input_path"]).unlink(missing_ok=True)
+        if rows:
+            logger.info(f"Job store removed {len(rows)} expired job(s)")
+        return len(rows)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,183 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from api.state import get_state
+from voice_services import audio_handler
+from voice_services import realtime_effects
+from voice_services import speech_synthesis
+from voice_services import translation
+from voice_services.job_store import Job, JobStore
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+JOB_POLL_SECONDS = 5.0
+JOB_RETRY_SECONDS = 5.0
+JOB_CLEANUP_INTERVAL_SECONDS = 3600
+
+# Statuses that mean "try again later" rather than "this job is broken"
+_RETRYABLE_STATUS = {429, 503}
+
+
+def _result_path(store: JobStore, job: Job, suffix: str) -> Path:
+    return store.results_dir / f"{job.job_id}{suffix}"
+
+
+async def _job_voice_id(job: Job) -> str:
+    """Return a live voice_id for the job, re-registering its copy of the reference if it expired."""
+    voice_id = job.params["voice_id"]
+    if job.input_path is None or get_state().voice_store.get(voice_id) is not None:
+        return voice_id
+    raw = await run_in_threadpool(Path(job.input_path).read_bytes)
+    executor = get_state().executors["chatterbox"]
+    return await executor.run(speech_synthesis.register_voice_reference, raw)
+
+
+async def _run_synthesize(store: JobStore, job: Job) -> Tuple[Path, str]:
+    """Synthesize the whole text as /synthesize does, so a job returns the same audio."""
+    params = {**job.params, "voice_id": await _job_voice_id(job)}
+    data = await speech_synthesis.synthesize(**params, fmt="wav")
+    path = _result_path(store, job, ".wav")
+    await run_in_threadpool(path.write_bytes, data)
+    return path, "audio/wav"
+
+
+async def _run_translate(store: JobStore, job: Job) -> Tuple[Path, str]:
+    raw = await run_in_threadpool(Path(job.input_path).read_bytes)
+    audio_array, _ = await run_in_threadpool(audio_handler.load_audio, raw, translation.SEAMLESS_SR)
+
+    async def on_progress(fraction: float) -> None:
+        await run_in_threadpool(store.set_progress, job.job_id, 0.99 * fraction)
+
+    segments = await translation.translate_segments(audio_array, job.params["translate_to"], on_progress=on_progress)
+    body = {
+        "translated_text": translation.join_segments(segments),
+        "segments": [asdict(seg) for seg in segments],
+    }
+    path = _result_path(store, job, ".json")
+    await run_in_threadpool(path.write_text, json.dumps(body))
+    return path, "application/json"
+
+
+async def _run_effects(store: JobStore, job: Job) -> Tuple[Path, str]:
+    path = _result_path(store, job, ".wav")
+    await run_in_threadpool(realtime_effects.render_effects_to_file, job.input_path, str(path), job.params["effects"])
+    return path, "audio/wav"
+
+
+HANDLERS: Dict[str, Callable[[JobStore, Job], Awaitable[Tuple[Path, str]]]] = {
+    "synthesize": _run_synthesize,
+    "translate": _run_translate,
+    "effects": _run_effects,
+}
+
+
+class JobWorker:
+    """Drains the job store on the event loop.
+
+    Each of ``concurrency`` loops claims the oldest queued job and runs it
+    through the same services as the synchronous endpoints, so model work
+    still goes through the inference executors. A job rejected with 429 or
+    503 (queue full, models loading) is put back and retried later. Store
+    calls go through the thread pool so SQLite never blocks the loop.
+    """
+
+    def __init__(self, store: JobStore, concurrency: int = JOB_WORKERS):
+        self.store = store
+        self.concurrency = concurrency
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._last_cleanup = 0.0
+
+    def start(self) -> None:
+        for i in range(self.concurrency):
+            # Jobs outlive the request that submitted them; start from a clean context
+            task = asyncio.create_task(self._loop(), name=f"job-worker-{i}", context=contextvars.Context())
+            self._tasks.append(task)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def notify(self) -> None:
+        """Wake idle loops after a submit instead of waiting for the next poll."""
+        self._wake.set()
+
+    async def _loop(self) -> None:
+        while True:
+            if time.time() - self._last_cleanup > JOB_CLEANUP_INTERVAL_SECONDS:
+                self._last_cleanup = time.time()
+                await run_in_threadpool(self.store.cleanup)
+
+            job = await run_in_threadpool(self.store.claim_next)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            retry_after = await self._run(job)
+            if retry_after:
+                await asyncio.sleep(retry_after)
+
+    async def _run(self, job: Job) -> Optional[float]:
+        """Run one job; returns a delay in seconds when it was requeued."""
+        logger.info(f"Job {job.job_id} ({job.kind}) started")
+        t0 = time.time()
+        try:
+            path, media_type = await HANDLERS[job.kind](self.store, job)
+        except HTTPException as exc:
+            if exc.status_code in _RETRYABLE_STATUS:
+                await run_in_threadpool(self.store.requeue, job.job_id)
+                headers = exc.headers or {}
+                return float(headers.get("Retry-After", JOB_RETRY_SECONDS))
+            await run_in_threadpool(self.store.fail, job.job_id, str(exc.detail))
+            logger.warning(f"Job {job.job_id} failed: {exc.detail}")
+            return None
+        except asyncio.CancelledError:
+            # Shutting down: leave it for the next process to pick up
+            self.store.requeue(job.job_id)
+            raise
+        except Exception as exc:
+            logger.exception(f"Job {job.job_id} failed")
+            await run_in_threadpool(self.store.fail, job.job_id, str(exc) or type(exc).__name__)
+            return None
+        await run_in_threadpool(self.store.complete, job.job_id, str(path), media_type)
+        logger.info(f"Job {job.job_id} ({job.kind}) done in {time.time() - t0:.1f}s")
+        return None
+
+
+_worker: Optional[JobWorker] = None
+
+
+def start_worker() -> JobWorker:
+    global _worker
+    if _worker is None:
+        _worker = JobWorker(get_state().job_store)
+        _worker.start()
+    return _worker
+
+
+async def stop_worker() -> None:
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
+
+
+def notify_worker() -> None:
+    if _worker is not None:
+        _worker.notify()
@@ -0,0 +1,103 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from api.state import get_state
+from voice_services import audio_handler
+from voice_services import realtime_effects
+from voice_services import speech_synthesis
+from voice_services import translation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PipelineResult:
+    audio: bytes
+    translated_text: str
+    voice_id: str
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def server_timing(self) -> str:
+        """Format stage timings (ms) as a Server-Timing header value."""
+        return ", ".join(f"{stage};dur={ms:.1f}" for stage, ms in self.timings.items())
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = (time.perf_counter() - t0) * 1000
+
+
+async def voice_translate(
+    content: bytes,
+    translate_to: str,
+    voice: Optional[bytes] = None,
+    voice_id: Optional[str] = None,
+    expressiveness: float = 0.5,
+    similarity: float = 0.6,
+    seed: Optional[int] = None,
+    effects_config: Optional[Dict[str, Any]] = None,
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> PipelineResult:
+    """Translate speech, re-synthesize it in a cloned voice and apply effects.
+
+    The voice comes from ``voice_id``, else the ``voice`` upload, else the
+    content clip itself. In the last case the content is decoded once and
+    resampled for both Seamless and Chatterbox. The language and voice_id
+    are checked before any decoding or model work. The synthesized waveform
+    stays in memory through effects and is encoded once, as ``fmt``.
+    """
+    translation.validate_language(translate_to)
+    if voice_id:
+        speech_synthesis.resolve_voice(voice_id)
+    timings: Dict[str, float] = {}
+    seamless_sr = translation.SEAMLESS_SR
+    ref_sr = speech_synthesis.CHATTERBOX_SR
+
+    with _timed(timings, "decode"):
+        rates = (seamless_sr,) if voice_id or voice else (seamless_sr, ref_sr)
+        prepared = await run_in_threadpool(audio_handler.decode_and_prepare, content, rates)
+        if voice and not voice_id:
+            voice_waveform = (await run_in_threadpool(audio_handler.decode_and_prepare, voice, (ref_sr,)))[ref_sr]
+        elif not voice_id:
+            voice_waveform = prepared[ref_sr]
+
+    with _timed(timings, "translate"):
+        text = await translation.translate_array(prepared[seamless_sr].squeeze(0).numpy(), translate_to)
+
+    if not voice_id:
+        with _timed(timings, "voice"):
+            executor = get_state().executors["chatterbox"]
+            voice_id = await executor.run(speech_synthesis.store_voice_reference, voice_waveform)
+
+    with _timed(timings, "synthesize"):
+        waveform = await speech_synthesis.synthesize_audio(
+            text=text,
+            voice_id=voice_id,
+            language=translate_to,
+            expressiveness=expressiveness,
+            similarity=similarity,
+            seed=seed,
+        )
+
+    if effects_config:
+        with _timed(timings, "effects"):
+            waveform = await run_in_threadpool(
+                realtime_effects.apply_effects, waveform.numpy(), ref_sr, effects_config
+            )
+
+    with _timed(timings, "encode"):
+        audio = await run_in_threadpool(audio_handler.encode_audio, waveform, ref_sr, fmt, bitrate)
+
+    logger.info(f"Voice-translate pipeline complete: {', '.join(f'{k}={v:.0f}ms' for k, v in timings.items())}")
+    return PipelineResult(audio=audio, translated_text=text, voice_id=voice_id, timings=timings)
+
@@ -1,5 +1,11 @@
+import contextvars
 import logging
-from typing import Dict, Any
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
 
 import numpy as np
 from pedalboard import (
@@ -26,8 +32,11 @@ from pedalboard import (
     PeakFilter,
     Resample,
 )
+from pedalboard.io import AudioFile
 
+from api import metrics
 from api.config import get_effect_configs
+from voice_services import audio_handler
 
 logger = logging.getLogger(__name__)
 
@@ -57,38 +66,280 @@ EFFECT_CLASS_MAP = {
 }
 
 
+# Plugins whose block-by-block output (reset=False) does not match a
+# whole-buffer render: PitchShift returns silence for blocks of a few
+# thousand frames, and both drift after the first block at any size
+WHOLE_BUFFER_PLUGINS = (PitchShift, GSMFullRateCompressor)
+
+
+def needs_whole_buffer(plugins: Iterable[Any]) -> bool:
+    """True when ``plugins`` must be rendered in one call rather than in blocks."""
+    return any(isinstance(plugin, WHOLE_BUFFER_PLUGINS) for plugin in plugins)
+
+
+def config_needs_whole_buffer(config: Dict[str, Dict[str, float]]) -> bool:
+    """Like ``needs_whole_buffer`` for an effects config, without building plugins."""
+    definitions = get_effect_definitions()
+    return any(
+        issubclass(EFFECT_CLASS_MAP[definitions[fx_name]["class"]], WHOLE_BUFFER_PLUGINS)
+        for fx_name, _ in normalize_config(config)
+    )
+
+
 def get_effect_definitions() -> Dict[str, Any]:
     return get_effect_configs()
 
 
-def build_pedalboard(config: Dict[str, Dict[str, float]]) -> Pedalboard:
-    chain = []
+INT_PARAMS = {"semitones", "bit_depth", "target_sample_rate"}
+
+# Parameter values are snapped to this many steps across their YAML range,
+# so near-identical slider positions share a cached board.
+QUANTIZE_STEPS = 1000
+
+PEDALBOARD_CACHE_SIZE = int(os.getenv("PEDALBOARD_CACHE_SIZE", "32"))
+PEDALBOARD_IDLE_PER_KEY = 4
+
+# Threads for rendering several effect chains at once; pedalboard releases
+# the GIL while processing, so these run on separate cores
+RENDER_WORKERS = int(os.getenv("EFFECTS_RENDER_WORKERS", str(os.cpu_count() or 4)))
+
+STREAM_BLOCK_FRAMES = int(os.getenv("EFFECTS_STREAM_BLOCK_FRAMES", "65536"))
+# Upper bound on silence fed after the input ends to drain plugin latency
+STREAM_MAX_FLUSH_SECONDS = 30
+
+EffectsKey = Tuple[Tuple[str, Tuple[Tuple[str, float], ...]], ...]
+
+
+def _quantize(param_name: str, value: Any, spec: Dict[str, Any]) -> float:
+    value = float(value)
+    lo, hi = spec.get("min"), spec.get("max")
+    if lo is not None and hi is not None:
+        value = min(max(value, lo), hi)
+        step = (hi - lo) / QUANTIZE_STEPS
+        if step > 0:
+            value = lo + round((value - lo) / step) * step
+    if param_name in INT_PARAMS:
+        return int(round(value))
+    return round(value, 6)
+
+
+def normalize_config(config: Dict[str, Dict[str, float]]) -> EffectsKey:
+    """Canonicalize an effects config into a hashable key.
+
+    Unknown effects are dropped, missing params take their defaults, and
+    values are clamped and quantized to the registry ranges. Effect order
+    is preserved since it changes the result.
+    """
     registry = get_effect_definitions()
+    key = []
     for fx_name, params in config.items():
         effect_cfg = registry.get(fx_name)
-        if not effect_cfg:
-            continue
-        cls = EFFECT_CLASS_MAP.get(effect_cfg["class"])
-        if not cls:
+        if not effect_cfg or effect_cfg.get("class") not in EFFECT_CLASS_MAP:
             continue
-        kwargs = {}
-        for param_name, values in effect_cfg.get("params", {}).items():
-            val = params.get(param_name, values.get("default"))
-            if param_name in {"semitones", "bit_depth", "target_sample_rate"}:
-                val = int(round(val))
-            kwargs[param_name] = val
+        params = params if isinstance(params, dict) else {}
+        values = []
+        for param_name, spec in effect_cfg.get("params", {}).items():
+            try:
+                val = _quantize(param_name, params.get(param_name, spec.get("default")), spec)
+            except (TypeError, ValueError):
+                val = _quantize(param_name, spec.get("default"), spec)
+            values.append((param_name, val))
+        key.append((fx_name, tuple(values)))
+    return tuple(key)
+
+
+def build_plugin(fx_name: str, values: Tuple[Tuple[str, float], ...]) -> Optional[Any]:
+    """Instantiate one effect from its normalized params, or None if it fails."""
+    cls = EFFECT_CLASS_MAP[get_effect_definitions()[fx_name]["class"]]
+    try:
+        return cls(**dict(values))
+    except Exception as exc:
+        logger.warning(f"Unable to add effect {fx_name}: {exc}")
+        return None
+
+
+def _build_from_key(key: EffectsKey) -> Pedalboard:
+    chain = [build_plugin(fx_name, values) for fx_name, values in key]
+    return Pedalboard([plugin for plugin in chain if plugin is not None])
+
+
+def build_pedalboard(config: Dict[str, Dict[str, float]]) -> Pedalboard:
+    return _build_from_key(normalize_config(config))
+
+
+class PedalboardCache:
+    """LRU cache of built pedalboards keyed by normalized config.
+
+    Boards carry DSP state, so each one is used by a single request at a
+    time: ``checkout`` hands out an idle board (or builds one) and resets
+    it before returning it to the pool.
+    """
+
+    def __init__(self, max_keys: int = PEDALBOARD_CACHE_SIZE, idle_per_key: int = PEDALBOARD_IDLE_PER_KEY):
+        self.max_keys = max_keys
+        self.idle_per_key = idle_per_key
+        self._idle: "OrderedDict[EffectsKey, List[Pedalboard]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self, config: Dict[str, Dict[str, float]]) -> Iterator[Pedalboard]:
+        key = normalize_config(config)
+        board = None
+        with self._lock:
+            boards = self._idle.get(key)
+            if boards is not None:
+                self._idle.move_to_end(key)
+                if boards:
+                    board = boards.pop()
+        if board is None:
+            board = _build_from_key(key)
         try:
-            chain.append(cls(**kwargs))
-        except Exception as exc:
-            logger.warning(f"Unable to add effect {fx_name}: {exc}")
-    return Pedalboard(chain)
+            yield board
+        finally:
+            board.reset()
+            with self._lock:
+                boards = self._idle.setdefault(key, [])
+                self._idle.move_to_end(key)
+                if len(boards) < self.idle_per_key:
+                    boards.append(board)
+                while len(self._idle) > self.max_keys:
+                    self._idle.popitem(last=False)
+
+
+_board_cache = PedalboardCache()
 
 
 def apply_effects(audio: np.ndarray, sr: int, config: Dict[str, Dict[str, float]]) -> np.ndarray:
     if not config:
         return audio
-    board = build_pedalboard(config)
     if len(audio.shape) == 1:
         audio = audio.reshape(1, -1)
-    return board(audio.astype(np.float32), sr)
+    with metrics.stage("effects"), _board_cache.checkout(config) as board:
+        # asarray only copies when the input is not already float32
+        return board(np.asarray(audio, dtype=np.float32), sr)
+
+
+def render_effects(
+    raw: bytes,
+    config: Dict[str, Dict[str, float]],
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> bytes:
+    """Decode audio bytes, apply effects and encode as ``fmt``, all in memory."""
+    waveform, sr = audio_handler.decode_audio(raw)
+    # .numpy() shares memory with the tensor; no copy on the way in or out
+    wav_np = waveform.numpy()
+    if config:
+        wav_np = apply_effects(wav_np, sr, config)
+    return audio_handler.encode_audio(wav_np, sr, fmt, bitrate)
+
+
+_render_pool = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="effects-render")
+
+
+def render_variants(
+    raw: bytes,
+    configs: List[Dict[str, Dict[str, float]]],
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> List[bytes]:
+    """Decode once and render every effects config in parallel, in order."""
+    waveform, sr = audio_handler.decode_audio(raw)
+    wav_np = waveform.numpy()
+
+    def render_one(config: Dict[str, Dict[str, float]]) -> bytes:
+        return audio_handler.encode_audio(apply_effects(wav_np, sr, config), sr, fmt, bitrate)
+
+    # Each task gets its own copy of the context so stage metrics keep the route label
+    futures = [_render_pool.submit(contextvars.copy_context().run, render_one, config) for config in configs]
+    return [future.result() for future in futures]
+
+
+def render_effects_to_file(
+    source: Union[str, BinaryIO],
+    output_path: str,
+    config: Dict[str, Dict[str, float]],
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> None:
+    """Render effects into a file, streaming when pedalboard can decode the source.
+
+    Only the WAV formats are written block by block; FLAC and Opus, and
+    chains with plugins that cannot stream, are rendered from the whole buffer.
+    """
+    if fmt in ("wav", "pcm16") and not config_needs_whole_buffer(config):
+        try:
+            apply_effects_streaming(source, output_path, config, pcm16=fmt == "pcm16")
+            return
+        except Exception as exc:
+            # pedalboard.io cannot decode every container (e.g. webm)
+            logger.warning(f"Streaming effects unavailable, using whole-buffer path: {exc}")
+    if isinstance(source, str):
+        with open(source, "rb") as fh:
+            raw = fh.read()
+    else:
+        source.seek(0)
+        raw = source.read()
+    data = render_effects(raw, config, fmt, bitrate)
+    with open(output_path, "wb") as fh:
+        fh.write(data)
+
+
+def apply_effects_streaming(
+    source: Union[str, BinaryIO],
+    output_path: str,
+    config: Dict[str, Dict[str, float]],
+    block_frames: int = STREAM_BLOCK_FRAMES,
+    pcm16: bool = False,
+) -> None:
+    """Process audio block by block into a float32 (or PCM16) WAV at ``output_path``.
+
+    Memory use is bounded by ``block_frames`` regardless of duration. The
+    board runs with ``reset=False`` so reverb and delay tails carry across
+    block boundaries, and the output has exactly as many frames as the
+    input, matching whole-buffer processing.
+    """
+    with (
+        metrics.stage("effects"),
+        AudioFile(source) as reader,
+        _board_cache.checkout(config) as board,
+        open(output_path, "wb") as out,
+    ):
+        sr = int(reader.samplerate)
+        channels = reader.num_channels
+
+        bits = 16 if pcm16 else 32
+        to_bytes = audio_handler.to_pcm16_bytes if pcm16 else audio_handler.to_float32_bytes
+
+        def header(frames: int) -> bytes:
+            return audio_handler.wav_header(sr, channels, bits_per_sample=bits, num_frames=frames, float_format=not pcm16)
+
+        out.write(header(0))
+
+        frames_in = 0
+        frames_out = 0
+        while True:
+            block = reader.read(block_frames)
+            if block.shape[-1] == 0:
+                break
+            frames_in += block.shape[-1]
+            processed = board(block, sr, reset=False)
+            out.write(to_bytes(processed))
+            frames_out += processed.shape[-1]
+
+        # Plugins with latency return fewer frames than they are fed while
+        # streaming; feed silence until the output catches up with the input.
+        silence = np.zeros((channels, block_frames), dtype=np.float32)
+        max_flush_blocks = int(STREAM_MAX_FLUSH_SECONDS * sr / block_frames) + 1
+        for _ in range(max_flush_blocks):
+            if frames_out >= frames_in:
+                break
+            processed = board(silence, sr, reset=False)[:, : frames_in - frames_out]
+            out.write(to_bytes(processed))
+            frames_out += processed.shape[-1]
+
+        out.seek(0)
+        out.write(header(frames_out))
 
+    metrics.observe_input_audio(frames_in / sr)
+    logger.info(f"Streamed effects over {frames_in} frames ({frames_in / sr:.1f}s)")
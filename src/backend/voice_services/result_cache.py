@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Canonicalize text so trivially different inputs share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def synthesis_cache_key(
+    text: str,
+    lang_code: str,
+    voice_id: str,
+    expressiveness: float,
+    similarity: float,
+    seed: int,
+) -> str:
+    payload = json.dumps(
+        [normalize_text(text), lang_code, voice_id, round(expressiveness, 4), round(similarity, 4), seed],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SynthesisCache:
+    """Size-bounded on-disk LRU cache of synthesized WAV files."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        for path in sorted(self.root.glob("*.wav"), key=lambda p: p.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+        self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.wav"
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            path = self._path(key)
+            if key not in self._entries or not path.exists():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            os.utime(path)
+            return path.read_bytes()
+
+    def put(self, key: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=self.root, prefix=".incoming-")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        size = len(data)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and self._total_bytes > self.max_bytes:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            path = self._path(key)
+            if path.exists():
+                path.unlink()
+            logger.debug(f"Evicted synthesis cache entry {key[:12]}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+# -80 dBFS: loudness references below this are treated as silence
+SILENCE_FLOOR_RMS = 1e-4
+
+
+@dataclass
+class Segment:
+    """A span of a clip, in samples."""
+
+    start: int
+    end: int
+
+    def seconds(self, sr: int) -> Tuple[float, float]:
+        return self.start / sr, self.end / sr
+
+
+def frame_energy_db(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS energy of consecutive frames in dB relative to the loudest frame.
+
+    The reference never drops below SILENCE_FLOOR_RMS, so a clip of digital
+    silence or near-silent noise reads as quiet rather than as all 0 dB.
+    """
+    num_frames = max(1, len(audio) // frame_len)
+    frames = audio[: num_frames * frame_len].reshape(num_frames, -1)
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1)) + 1e-10
+    return 20 * np.log10(rms / max(rms.max(), SILENCE_FLOOR_RMS))
+
+
+def split_on_silence(
+    audio: np.ndarray,
+    sr: int,
+    max_seconds: float = 20.0,
+    min_silence_ms: float = 300,
+    threshold_db: float = -40.0,
+    frame_ms: float = 20,
+) -> List[Segment]:
+    """Split a mono clip at pauses into segments no longer than ``max_seconds``.
+
+    Frames quieter than ``threshold_db`` below the loudest frame count as
+    silence. Segments are cut in the middle of the latest pause of at least
+    ``min_silence_ms`` that keeps them under the limit, or hard-cut at the
+    limit when speech never pauses. Leading, trailing and segment-long
+    silences are dropped.
+    """
+    frame_len = max(1, int(sr * frame_ms / 1000))
+    if len(audio) < frame_len:
+        return [Segment(0, len(audio))] if len(audio) else []
+    voiced = frame_energy_db(audio, frame_len) > threshold_db
+    if not voiced.any():
+        return []
+
+    # Candidate cut points: the midpoint of each long enough silent run
+    min_silent_frames = max(1, int(min_silence_ms / frame_ms))
+    cuts = []
+    run_start = None
+    for i, is_voiced in enumerate(np.append(voiced, True)):
+        if not is_voiced and run_start is None:
+            run_start = i
+        elif is_voiced and run_start is not None:
+            if i - run_start >= min_silent_frames:
+                cuts.append((run_start + i) // 2)
+            run_start = None
+
+    # Greedily extend each segment to the latest pause that fits the limit
+    max_frames = max(1, int(max_seconds * 1000 / frame_ms))
+    boundaries = [0]
+    while len(voiced) - boundaries[-1] > max_frames:
+        start = boundaries[-1]
+        within = [c for c in cuts if start < c <= start + max_frames]
+        boundaries.append(within[-1] if within else start + max_frames)
+    boundaries.append(len(voiced))
+
+    segments = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        span = np.flatnonzero(voiced[start:end])
+        if span.size:
+            segments.append(Segment((start + span[0]) * frame_len, min(len(audio), (start + span[-1] + 1) * frame_len)))
+    # Keep the tail that did not fill a whole frame
+    if segments and segments[-1].end >= len(voiced) * frame_len:
+        segments[-1].end = len(audio)
+    return segments
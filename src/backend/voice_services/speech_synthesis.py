@@ -1,48 +1,283 @@
 import logging
-import tempfile
+import re
 import time
+from typing import AsyncIterator, List, Optional
 
-import torchaudio
+import numpy as np
+import torch
 from fastapi import HTTPException
 
-from api import config
+from api import config, metrics, profiling
 from api.state import get_state
+from voice_services import audio_handler
+from voice_services.result_cache import synthesis_cache_key
 
 logger = logging.getLogger(__name__)
 
+# S3Gen output rate, also the rate voice references are stored at
+CHATTERBOX_SR = 24000
+STREAM_CHUNK_MAX_CHARS = 300
+STREAM_CROSSFADE_MS = 20
 
-def synthesize_text(
+_SENTENCE_END = re.compile(r"(?<=[.!?;\u3002\uff01\uff1f\u061f\u0964])\s+|(?<=[\u3002\uff01\uff1f])")
+_CLAUSE_END = re.compile(r"(?<=[,:\u3001\uff0c\u060c])\s*")
+
+
+def prepare_voice_conditioning(path: str, voice_id: str, expressiveness: float = 0.5):
+    """Return cached Chatterbox conditionals for a voice, computing them on a miss.
+
+    Must be called with ``chatterbox_lock`` held, since computing conditionals
+    overwrites ``chatterbox.conds``.
+    """
+    app_state = get_state()
+    conds = app_state.conditioning_cache.get(voice_id)
+    if conds is not None:
+        return conds
+
+    t0 = time.time()
+    with app_state.residency.use("chatterbox"):
+        chatterbox = app_state.chatterbox
+        with profiling.trace("chatterbox-conditioning"):
+            chatterbox.prepare_conditionals(path, exaggeration=expressiveness)
+        conds = chatterbox.conds
+    app_state.conditioning_cache.put(voice_id, conds)
+    logger.info(f"Voice conditioning computed in {time.time() - t0:.1f}s ({voice_id})")
+    return conds
+
+
+def register_voice_reference(content: bytes) -> str:
+    """Convert an uploaded voice sample to 24kHz WAV, store it and warm its conditioning."""
+    # Upload may be webm, ogg, wav, etc.; chatterbox expects 24kHz
+    waveform = audio_handler.decode_and_prepare(content, (CHATTERBOX_SR,))[CHATTERBOX_SR]
+    return store_voice_reference(waveform)
+
+
+def store_voice_reference(waveform: torch.Tensor) -> str:
+    """Store a mono 24kHz reference waveform and warm its conditioning."""
+    app_state = get_state()
+    entry = app_state.voice_store.add(waveform, CHATTERBOX_SR)
+    logger.info(f"Voice reference stored: {entry.voice_id}")
+
+    # Warm the conditioning cache so the first synthesis skips it
+    if app_state.models_ready:
+        with app_state.chatterbox_lock:
+            prepare_voice_conditioning(entry.path, entry.voice_id)
+    return entry.voice_id
+
+
+def resolve_voice(voice_id: str):
+    app_state = get_state()
+    voice = app_state.voice_store.get(voice_id)
+    if voice is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired voice_id. Upload the voice reference again.")
+
+    if not app_state.models_ready:
+        raise HTTPException(status_code=503, detail="Models are still loading. Try again shortly.")
+    return voice
+
+
+def _generate(
+    voice,
     text: str,
-    language: str,
+    lang_code: str,
     expressiveness: float,
     similarity: float,
-) -> str:
+    seed: Optional[int],
+) -> torch.Tensor:
     app_state = get_state()
-    if not app_state.voice_reference_path:
-        raise HTTPException(status_code=400, detail="No voice reference uploaded")
+    with app_state.chatterbox_lock, app_state.residency.use("chatterbox"):
+        chatterbox = app_state.chatterbox
+        # Exaggeration only scales the emotion embedding, which generate()
+        # swaps in cheaply, so conditionals are shared across expressiveness.
+        conds = prepare_voice_conditioning(voice.path, voice.voice_id, expressiveness)
+        chatterbox.conds = conds.to(chatterbox.device)
+        if seed is not None:
+            torch.manual_seed(seed)
+        t0 = time.time()
+        with profiling.trace("chatterbox-generate"):
+            wav = chatterbox.generate(
+                text,
+                language_id=lang_code,
+                exaggeration=expressiveness,
+                cfg_weight=similarity,
+            )
+        t1 = time.time()
+    logger.info(f"Synthesis generation took {t1 - t0:.1f}s")
+    return wav
 
-    chatterbox = app_state.chatterbox
-    if chatterbox is None:
-        raise HTTPException(status_code=503, detail="Models are still loading. Try again shortly.")
 
+def split_sentences(text: str, max_chars: int = STREAM_CHUNK_MAX_CHARS) -> List[str]:
+    """Split text into sentences, breaking overly long ones at clause boundaries."""
+    chunks = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        current = ""
+        for clause in _CLAUSE_END.split(sentence):
+            if current and len(current) + len(clause) + 1 > max_chars:
+                chunks.append(current.strip())
+                current = ""
+            current = f"{current} {clause}" if current else clause
+        if current.strip():
+            chunks.append(current.strip())
+    return chunks
+
+
+def synthesize_waveform(
+    text: str,
+    voice_id: str,
+    language: str,
+    expressiveness: float,
+    similarity: float,
+    seed: Optional[int] = None,
+) -> torch.Tensor:
+    """Synthesize ``text`` in the given voice as a ``(1, frames)`` float32 waveform at CHATTERBOX_SR."""
+    app_state = get_state()
+    voice = resolve_voice(voice_id)
     lang_code = config.get_chatterbox_code(language)
-    
+
+    # Sampling is only reproducible with a fixed seed, so only then is a
+    # previous result a valid answer.
+    cache = app_state.synthesis_cache if seed is not None else None
+    cache_key = None
+    if cache is not None:
+        cache_key = synthesis_cache_key(text, lang_code, voice.voice_id, expressiveness, similarity, seed)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Synthesis cache hit ({cache_key[:12]})")
+            # Cached as float32 WAV, so this is a lossless read
+            return audio_handler.decode_audio(cached)[0]
+
     logger.info(f"Synthesis starting: {len(text)} chars, lang={lang_code}")
-    
-    t0 = time.time()
-    wav = chatterbox.generate(
-        text,
-        audio_prompt_path=app_state.voice_reference_path,
-        language_id=lang_code,
-        exaggeration=expressiveness,
-        cfg_weight=similarity,
+    wav = _generate(voice, text, lang_code, expressiveness, similarity, seed)
+
+    if cache_key is not None:
+        cache.put(cache_key, audio_handler.encode_wav(wav, CHATTERBOX_SR))
+
+    logger.info(f"Synthesis complete: {wav.shape[-1] / CHATTERBOX_SR:.1f}s of audio")
+    return wav
+
+
+def synthesize_text(
+    text: str,
+    voice_id: str,
+    language: str,
+    expressiveness: float,
+    similarity: float,
+    seed: Optional[int] = None,
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> bytes:
+    """Synthesize ``text`` in the given voice and return it encoded as ``fmt``."""
+    wav = synthesize_waveform(text, voice_id, language, expressiveness, similarity, seed)
+    return audio_handler.encode_audio(wav, CHATTERBOX_SR, fmt, bitrate)
+
+
+async def _run_synthesis(fn, text: str, voice_id: str, **kwargs):
+    resolve_voice(voice_id)
+    metrics.observe_text_length(len(text))
+    executor = get_state().executors["chatterbox"]
+    with metrics.stage("inference"):
+        return await executor.run(fn, text=text, voice_id=voice_id, **kwargs)
+
+
+async def synthesize(
+    text: str,
+    voice_id: str,
+    language: str,
+    expressiveness: float,
+    similarity: float,
+    seed: Optional[int] = None,
+    fmt: str = "wav",
+    bitrate: Optional[int] = None,
+) -> bytes:
+    """Run synthesize_text as one job on the chatterbox executor; raises 429 when its queue is full."""
+    return await _run_synthesis(
+        synthesize_text,
+        text=text,
+        voice_id=voice_id,
+        language=language,
+        expressiveness=expressiveness,
+        similarity=similarity,
+        seed=seed,
+        fmt=fmt,
+        bitrate=bitrate,
     )
-    t1 = time.time()
-    logger.info(f"Synthesis generation took {t1 - t0:.1f}s")
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-    torchaudio.save(tmp.name, wav, chatterbox.sr)
-    tmp.close()
-    
-    logger.info(f"Synthesis complete, saved to {tmp.name}")
-    return tmp.name
+
+async def synthesize_audio(
+    text: str,
+    voice_id: str,
+    language: str,
+    expressiveness: float,
+    similarity: float,
+    seed: Optional[int] = None,
+) -> torch.Tensor:
+    """Like ``synthesize`` but return the waveform, for callers that process it before encoding."""
+    return await _run_synthesis(
+        synthesize_waveform,
+        text=text,
+        voice_id=voice_id,
+        language=language,
+        expressiveness=expressiveness,
+        similarity=similarity,
+        seed=seed,
+    )
+
+
+def synthesize_stream(
+    text: str,
+    voice_id: str,
+    language: str,
+    expressiveness: float,
+    similarity: float,
+    seed: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """Synthesize sentence by sentence, yielding a streamed PCM16 WAV.
+
+    Validation and queue admission happen before the first byte is produced
+    so errors still surface as HTTP status codes. Each sentence is a separate
+    job on the chatterbox executor, and adjacent chunks are joined with a
+    short linear crossfade.
+    """
+    voice = resolve_voice(voice_id)
+    lang_code = config.get_chatterbox_code(language)
+    sentences = split_sentences(text)
+    if not sentences:
+        raise HTTPException(status_code=400, detail="Text is empty")
+    executor = get_state().executors["chatterbox"]
+    executor.check_capacity()
+    metrics.observe_text_length(len(text))
+
+    sr = CHATTERBOX_SR
+    fade_len = int(sr * STREAM_CROSSFADE_MS / 1000)
+    fade_in = np.linspace(0.0, 1.0, fade_len, dtype=np.float32)
+    fade_out = 1.0 - fade_in
+
+    async def _chunks() -> AsyncIterator[bytes]:
+        logger.info(f"Streaming synthesis starting: {len(sentences)} chunks, lang={lang_code}")
+        yield audio_handler.wav_header(sr, num_channels=1, bits_per_sample=16)
+        tail = np.zeros(0, dtype=np.float32)
+        for i, sentence in enumerate(sentences):
+            chunk_seed = seed + i if seed is not None else None
+            with metrics.stage("inference"):
+                wav = await executor.run(
+                    _generate, voice, sentence, lang_code, expressiveness, similarity, chunk_seed,
+                    enforce_limit=False,
+                )
+            samples = wav.squeeze(0).numpy()
+            if len(tail) == fade_len and len(samples) >= 2 * fade_len:
+                head = tail * fade_out + samples[:fade_len] * fade_in
+                body = np.concatenate([head, samples[fade_len:-fade_len]])
+            else:
+                body = np.concatenate([tail, samples[:-fade_len]])
+            tail = samples[-fade_len:]
+            yield audio_handler.to_pcm16_bytes(body)
+        yield audio_handler.to_pcm16_bytes(tail)
+        logger.info("Streaming synthesis complete")
+
+    return _chunks()
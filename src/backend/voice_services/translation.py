@@ -1,53 +1,176 @@
+import asyncio
 import logging
 import os
 import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
 
+import numpy as np
 from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
 import torch
 
-from api import config
+from api import config, metrics, profiling
 from api.state import get_state, DEVICE
-from voice_services.audio_handler import save_upload_to_temp, load_audio
+from voice_services.audio_handler import load_audio
+from voice_services.batching import MicroBatcher
+from voice_services.segmentation import split_on_silence
 
 logger = logging.getLogger(__name__)
 
+SEAMLESS_SR = 16000
+TRANSLATE_BATCH_MAX_SIZE = int(os.getenv("TRANSLATE_BATCH_MAX_SIZE", "8"))
+TRANSLATE_BATCH_MAX_WAIT_MS = float(os.getenv("TRANSLATE_BATCH_MAX_WAIT_MS", "25"))
+SEGMENT_MAX_SECONDS = float(os.getenv("TRANSLATE_SEGMENT_MAX_SECONDS", "20"))
+SEGMENT_MIN_SILENCE_MS = float(os.getenv("TRANSLATE_SEGMENT_MIN_SILENCE_MS", "300"))
+SEGMENT_SILENCE_DB = float(os.getenv("TRANSLATE_SEGMENT_SILENCE_DB", "-40"))
 
-async def translate_audio(upload: UploadFile, target_language: str) -> str:
+
+@dataclass
+class TranslatedSegment:
+    start: float
+    end: float
+    text: str
+
+
+def join_segments(segments: List[TranslatedSegment]) -> str:
+    return " ".join(seg.text.strip() for seg in segments if seg.text.strip())
+
+
+def validate_language(target_language: str) -> None:
     languages = config.get_language_map()
     if target_language not in languages:
         raise HTTPException(status_code=400, detail=f"Unsupported language: {target_language}")
 
-    seamless_code = config.get_seamless_code(target_language)
 
+async def translate_audio(upload: UploadFile, target_language: str) -> List[TranslatedSegment]:
+    validate_language(target_language)
     raw_bytes = await upload.read()
-    tmp_path = save_upload_to_temp(raw_bytes)
-
-    try:
-        logger.info(f"Translation starting: target={target_language} ({seamless_code})")
-        t0 = time.time()
-        
-        audio_array, sr = load_audio(tmp_path)
-        logger.debug(f"Audio loaded: {len(audio_array)} samples, sr={sr}")
-        
-        app_state = get_state()
+    audio_array = await run_in_threadpool(_decode_bytes, raw_bytes)
+    return await translate_segments(audio_array, target_language)
+
+
+async def translate_array(audio_array: np.ndarray, target_language: str) -> str:
+    """Translate an already decoded mono 16kHz clip."""
+    return join_segments(await translate_segments(audio_array, target_language))
+
+
+async def translate_segments(
+    audio_array: np.ndarray,
+    target_language: str,
+    on_progress: Optional[Callable[[float], Awaitable[None]]] = None,
+) -> List[TranslatedSegment]:
+    """Split a mono 16kHz clip at pauses and translate the segments as batches.
+
+    Segments are at most TRANSLATE_SEGMENT_MAX_SECONDS long, so attention
+    memory stays bounded however long the clip is. They go through the
+    translation batcher shortest first, so each padded batch holds segments
+    of similar length. ``on_progress`` is awaited with the fraction
+    of segments done as each one finishes.
+
+    The clip is admitted as one unit: it holds a single executor slot and
+    keeps at most one batch of segments in flight, which the batcher runs
+    as one job, so a long clip neither floods the queue nor gets rejected
+    partway through.
+    """
+    validate_language(target_language)
+    seamless_code = config.get_seamless_code(target_language)
+
+    executor = get_state().executors["seamless"]
+
+    spans = await run_in_threadpool(
+        split_on_silence,
+        audio_array,
+        SEAMLESS_SR,
+        max_seconds=SEGMENT_MAX_SECONDS,
+        min_silence_ms=SEGMENT_MIN_SILENCE_MS,
+        threshold_db=SEGMENT_SILENCE_DB,
+    )
+    if not spans:
+        return []
+    if len(spans) > 1:
+        logger.info(f"Translating {len(audio_array) / SEAMLESS_SR:.1f}s clip as {len(spans)} segments")
+
+    done = 0
+
+    in_flight = asyncio.Semaphore(min(len(spans), TRANSLATE_BATCH_MAX_SIZE))
+
+    async def _translate(span) -> str:
+        nonlocal done
+        async with in_flight:
+            text = await _submit(audio_array[span.start:span.end], seamless_code)
+        done += 1
+        if on_progress is not None:
+            await on_progress(done / len(spans))
+        return text
+
+    order = sorted(range(len(spans)), key=lambda i: spans[i].end - spans[i].start)
+    # Taken before the first await, so admission and enqueueing are atomic
+    # and the clip counts against the queue while its segments wait in the batcher
+    with executor.reservation(), metrics.stage("inference"):
+        texts = await asyncio.gather(*(_translate(spans[i]) for i in order))
+    results = dict(zip(order, texts))
+    return [
+        TranslatedSegment(*span.seconds(SEAMLESS_SR), text=results[i])
+        for i, span in enumerate(spans)
+    ]
+
+
+def _decode_bytes(raw_bytes: bytes) -> np.ndarray:
+    audio_array, sr = load_audio(raw_bytes, target_sr=SEAMLESS_SR)
+    logger.debug(f"Audio loaded: {len(audio_array)} samples, sr={sr}")
+    return audio_array
+
+
+def translate_batch(audio_arrays: List[np.ndarray], seamless_code: str) -> List[str]:
+    """Translate several 16kHz clips into one target language with a single padded generate call."""
+    app_state = get_state()
+    if not app_state.models_ready:
+        raise HTTPException(status_code=503, detail="Models are still loading. Try again shortly.")
+
+    logger.info(f"Translation starting: {len(audio_arrays)} clip(s), target={seamless_code}")
+    t0 = time.time()
+
+    with app_state.residency.use("seamless"):
         processor = app_state.seamless_processor
         model = app_state.seamless_model
-        if not processor or not model:
-            raise HTTPException(status_code=503, detail="Models are still loading. Try again shortly.")
+        inputs = processor(
+            audio=audio_arrays,
+            sampling_rate=SEAMLESS_SR,
+            padding=True,
+            return_tensors="pt",
+        ).to(DEVICE)
 
-        inputs = processor(audio=audio_array, sampling_rate=sr, return_tensors="pt").to(DEVICE)
-        
         t1 = time.time()
-        with torch.no_grad():
+        with torch.no_grad(), app_state.cpu_optimizer.autocast(), profiling.trace("seamless-generate"):
             output = model.generate(**inputs, tgt_lang=seamless_code)
         t2 = time.time()
 
-        translated_text = processor.decode(output[0].squeeze().tolist(), skip_special_tokens=True)
-        
-        logger.info(f"Translation complete in {t2 - t0:.1f}s (inference: {t2 - t1:.1f}s)")
-        logger.debug(f"Translation result: {translated_text[:100]}...")
-        
-        return translated_text
-    finally:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        translated = processor.batch_decode(output, skip_special_tokens=True)
+
+    logger.info(f"Translation complete in {t2 - t0:.1f}s (inference: {t2 - t1:.1f}s)")
+    logger.debug(f"Translation result: {translated[0][:100]}...")
+
+    return translated
+
+
+async def _submit(audio_array: np.ndarray, seamless_code: str) -> str:
+    """Translate one segment; the caller holds an executor slot for it."""
+    if profiling.active():
+        # Profiled requests run on their own so the trace holds only their work
+        executor = get_state().executors["seamless"]
+        return (await executor.run(translate_batch, [audio_array], seamless_code, reserved=True))[0]
+    return await _batcher.submit(audio_array, seamless_code)
+
+
+async def _run_batch(seamless_code: str, audio_arrays: List[np.ndarray]) -> List[str]:
+    executor = get_state().executors["seamless"]
+    return await executor.run(translate_batch, audio_arrays, seamless_code, reserved=True)
+
+
+_batcher = MicroBatcher(
+    "translation",
+    _run_batch,
+    max_batch_size=TRANSLATE_BATCH_MAX_SIZE,
+    max_wait_ms=TRANSLATE_BATCH_MAX_WAIT_MS,
+)
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import torch
+
+from voice_services.audio_handler import encode_wav
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class VoiceEntry:
+    voice_id: str
+    path: str
+    last_used: float
+
+
+class VoiceStore:
+    """Content-addressed store of voice reference WAVs.
+
+    Each upload is saved as ``<voice_id>.wav`` where the ID is derived from
+    the file hash, so identical uploads share one file. Entries idle for
+    longer than ``ttl_seconds``, or beyond ``max_entries`` (least recently
+    used first), are deleted along with their WAV.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ttl_seconds: float = 3600,
+        max_entries: int = 64,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, VoiceEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_existing()
+
+    def _index_existing(self) -> None:
+        files = sorted(self.root.glob("*.wav"), key=lambda p: p.stat().st_mtime)
+        for path in files:
+            voice_id = path.stem
+            self._entries[voice_id] = VoiceEntry(voice_id, str(path), path.stat().st_mtime)
+        if files:
+            logger.info(f"Voice store indexed {len(files)} existing voices in {self.root}")
+
+    def add(self, waveform: torch.Tensor, sr: int) -> VoiceEntry:
+        """Save a waveform and return its entry, reusing an identical upload.
+
+        The entry is returned directly so callers never race an eviction
+        between adding and looking it up.
+        """
+        data = encode_wav(waveform, sr)
+        voice_id = hashlib.sha256(data).hexdigest()[:32]
+        path = self.root / f"{voice_id}.wav"
+        with self._lock:
+            if voice_id in self._entries and path.exists():
+                logger.info(f"Voice reference deduplicated: {voice_id}")
+            else:
+                fd, tmp_path = tempfile.mkstemp(suffix=".wav", dir=self.root, prefix=".upload-")
+                with os.fdopen(fd, "wb") as fh:
+                    fh.write(data)
+                os.replace(tmp_path, path)
+            entry = self._entries[voice_id] = VoiceEntry(voice_id, str(path), time.time())
+            self._entries.move_to_end(voice_id)
+        self.cleanup()
+        return entry
+
+    def get(self, voice_id: str) -> Optional[VoiceEntry]:
+        self.cleanup()
+        with self._lock:
+            entry = self._entries.get(voice_id)
+            if entry is None:
+                return None
+            entry.last_used = time.time()
+            self._entries.move_to_end(voice_id)
+            return entry
+
+    def remove(self, voice_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(voice_id, None)
+        if entry is None:
+            return False
+        self._delete(entry)
+        return True
+
+    def cleanup(self) -> List[str]:
+        """Drop expired and over-capacity entries; return the removed IDs."""
+        now = time.time()
+        removed = []
+        with self._lock:
+            for voice_id, entry in list(self._entries.items()):
+                if now - entry.last_used > self.ttl_seconds:
+                    removed.append(self._entries.pop(voice_id))
+            while len(self._entries) > self.max_entries:
+                removed.append(self._entries.popitem(last=False)[1])
+        for entry in removed:
+            self._delete(entry)
+        return [entry.voice_id for entry in removed]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _delete(self, entry: VoiceEntry) -> None:
+        if os.path.exists(entry.path):
+            os.unlink(entry.path)
+        if self.on_evict:
+            self.on_evict(entry.voice_id)
+        logger.info(f"Voice reference removed: {entry.voice_id}")
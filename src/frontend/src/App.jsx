@@ -2,9 +2,14 @@ import { useState, useRef, useEffect, useCallback } from 'react';
 import { Mic, Upload, Type, Play, Square, Download, Trash2, Volume2, Activity, Sparkles, Globe, User, Loader2, X, Pause, Check, Sliders, RotateCcw, LogOut, HelpCircle } from 'lucide-react';
 import { AuthProvider, useAuth } from './auth/AuthContext';
 import Login from './auth/Login';
+import { useEffectsSession } from './hooks/useEffectsSession';
 
 const isLocalDev = window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1';
 const API_URL = isLocalDev ? 'http://localhost:8000' : '';
+// The live effects session is local development only: Firebase Hosting
+// rewrites cannot carry WebSockets and the deployed API proxy forwards plain
+// HTTP, so production always renders effects through /api/apply-effects
+const EFFECTS_WS_URL = isLocalDev ? 'ws://localhost:8000/api/effects/session' : null;
 
 const EFFECTS = {
   noise_gate: { label: 'Noise Gate', desc: 'Silences audio below threshold', params: { threshold_db: { min: -100, max: 0, default: -40, unit: 'dB' } } },
@@ -271,7 +276,7 @@ const Waveform = ({ audioBlob, audioUrl, currentTime = 0, duration = 0, onSeek }
   );
 };
 
-const AudioPlayer = ({ blob, url, onDelete, label }) => {
+const AudioPlayer = ({ blob, url, onDelete, label, onTimeUpdate, onPlayingChange, muted }) => {
   const [playing, setPlaying] = useState(false);
   const [duration, setDuration] = useState(0);
   const [time, setTime] = useState(0);
@@ -283,13 +288,18 @@ const AudioPlayer = ({ blob, url, onDelete, label }) => {
     if (!src) return;
     if (!url && blob) urlRef.current = src;
     const audio = new Audio(src);
+    audio.muted = !!muted;
+    setPlaying(false);
     audio.addEventListener('loadedmetadata', () => setDuration(audio.duration));
-    audio.addEventListener('timeupdate', () => setTime(audio.currentTime));
+    audio.addEventListener('timeupdate', () => { setTime(audio.currentTime); onTimeUpdate?.(audio.currentTime); });
     audio.addEventListener('ended', () => { setPlaying(false); setTime(0); });
     audioRef.current = audio;
     return () => { audio.pause(); if (urlRef.current) URL.revokeObjectURL(urlRef.current); };
   }, [blob, url]);
 
+  useEffect(() => { if (audioRef.current) audioRef.current.muted = !!muted; }, [muted]);
+  useEffect(() => { onPlayingChange?.(playing); }, [playing]);
+
   const toggle = () => { if (!audioRef.current) return; playing ? audioRef.current.pause() : audioRef.current.play(); setPlaying(!playing); };
   const seek = (t) => { if (audioRef.current) { audioRef.current.currentTime = t; setTime(t); } };
   const fmt = (t) => `${Math.floor(t / 60)}:${Math.floor(t % 60).toString().padStart(2, '0')}`;
@@ -503,6 +513,8 @@ function VoiceStudioContent() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [rawAudioBlob, setRawAudioBlob] = useState(null);
   const [outputAudioUrl, setOutputAudioUrl] = useState(null);
+  const [renderedAudioUrl, setRenderedAudioUrl] = useState(null);
+  const [outputPlaying, setOutputPlaying] = useState(false);
   const [translatedText, setTranslatedText] = useState('');
   const [isApplyingEffects, setIsApplyingEffects] = useState(false);
   const [error, setError] = useState(null);
@@ -513,6 +525,7 @@ function VoiceStudioContent() {
   const audioChunksRef = useRef([]);
   const streamRef = useRef(null);
   const effectsDebounceRef = useRef(null);
+  const outputTimeRef = useRef(0);
 
   const authenticatedFetch = async (url, options = {}) => {
     const headers = { ...options.headers };
@@ -592,6 +605,7 @@ function VoiceStudioContent() {
       const form = new FormData();
       form.append('audio', blob, 'audio.wav');
       form.append('effects', JSON.stringify(activeEffects));
+      form.append('format', 'pcm16');
       const res = await authenticatedFetch(`${API_URL}/api/apply-effects`, { method: 'POST', body: form });
       if (!res.ok) throw new Error('Effects failed');
       setOutputAudioUrl(URL.createObjectURL(await res.blob()));
@@ -599,20 +613,36 @@ function VoiceStudioContent() {
     finally { setIsApplyingEffects(false); }
   }, [activeEffects, token]);
 
+  const { live: effectsLive, auditioning: effectsAuditioning } = useEffectsSession(
+    EFFECTS_WS_URL, rawAudioBlob, activeEffects, outputTimeRef, outputPlaying,
+    useCallback((blob) => setRenderedAudioUrl(URL.createObjectURL(blob)), []),
+  );
+
+  // Live renders are heard through the session while playing; the finished
+  // clip replaces the player's source only once playback stops
+  useEffect(() => {
+    if (!renderedAudioUrl || outputPlaying) return;
+    setOutputAudioUrl(renderedAudioUrl);
+    setRenderedAudioUrl(null);
+  }, [renderedAudioUrl, outputPlaying]);
+
   useEffect(() => {
-    if (!rawAudioBlob || isProcessing) return;
+    if (!rawAudioBlob || isProcessing || effectsLive) return;
     if (effectsDebounceRef.current) clearTimeout(effectsDebounceRef.current);
     effectsDebounceRef.current = setTimeout(() => {
       Object.keys(activeEffects).length > 0 ? applyEffects(rawAudioBlob) : setOutputAudioUrl(URL.createObjectURL(rawAudioBlob));
     }, 300);
-  }, [activeEffects, rawAudioBlob, isProcessing, applyEffects]);
+  }, [activeEffects, rawAudioBlob, isProcessing, applyEffects, effectsLive]);
 
   const generate = async () => {
-    setIsProcessing(true); setError(null); setTranslatedText(''); setOutputAudioUrl(null);
+    setIsProcessing(true); setError(null); setTranslatedText(''); setOutputAudioUrl(null); setRenderedAudioUrl(null); setOutputPlaying(false);
     try {
       const voiceForm = new FormData();
       voiceForm.append('file', voiceBlob);
-      await authenticatedFetch(`${API_URL}/api/voice-reference`, { method: 'POST', body: voiceForm });
+      const voiceRes = await authenticatedFetch(`${API_URL}/api/voice-reference`, { method: 'POST', body: voiceForm });
+      if (voiceRes.status === 403) throw new Error('Access denied: User not in whitelist');
+      if (!voiceRes.ok) throw new Error('Voice upload failed');
+      const { voice_id: voiceId } = await voiceRes.json();
 
       const audio = contentMode === 'voice' ? voiceBlob : contentBlob;
       let text = textInput;
@@ -632,9 +662,14 @@ function VoiceStudioContent() {
       setCurrentStage('synthesizing');
       const form = new FormData();
       form.append('text', text);
+      form.append('voice_id', voiceId);
       form.append('language', translateTo || 'English');
       form.append('expressiveness', expressiveness.toString());
       form.append('similarity', similarity.toString());
+      // Each Generate is a new take; the explicit seed keeps that take
+      // reproducible (and cacheable) when the same request is repeated
+      form.append('seed', Math.floor(Math.random() * 2 ** 31).toString());
+      form.append('format', 'pcm16');
       const res = await authenticatedFetch(`${API_URL}/api/synthesize`, { method: 'POST', body: form });
       if (res.status === 403) throw new Error('Access denied: User not in whitelist');
       if (!res.ok) throw new Error('Synthesis failed');
@@ -648,7 +683,7 @@ function VoiceStudioContent() {
   };
 
   useEffect(() => {
-    setRawAudioBlob(null); setOutputAudioUrl(null); setTranslatedText(''); setCurrentStage('idle');
+    setRawAudioBlob(null); setOutputAudioUrl(null); setRenderedAudioUrl(null); setOutputPlaying(false); setTranslatedText(''); setCurrentStage('idle');
   }, [voiceBlob, contentBlob, textInput, translateTo, contentMode]);
 
   const effectCount = Object.keys(activeEffects).length;
@@ -858,7 +893,7 @@ function VoiceStudioContent() {
                       <p className="text-sm text-slate-300">"{translatedText}"</p>
                     </div>
                   )}
-                  <AudioPlayer url={outputAudioUrl} label="Output" />
+                  <AudioPlayer url={outputAudioUrl} label="Output" muted={effectsAuditioning} onPlayingChange={setOutputPlaying} onTimeUpdate={(t) => { outputTimeRef.current = t; }} />
                 </div>
               )}
             </div>
@@ -895,7 +930,7 @@ function VoiceStudioContent() {
           {/* Download button - bottom right on all screens */}
           {outputAudioUrl && !isProcessing && (
             <a
-              href={outputAudioUrl}
+              href={renderedAudioUrl || outputAudioUrl}
               download={generateFilename()}
               className="absolute bottom-3 right-3 flex items-center gap-1.5 px-3 py-1.5 bg-slate-100 hover:bg-white text-slate-800 rounded-lg transition text-sm font-medium shadow-lg z-10"
             >
@@ -0,0 +1,212 @@
+import { useState, useEffect, useRef } from 'react';
+
+// Head start for the first scheduled block, so it is not already late
+const PLAYBACK_LEAD_SECONDS = 0.05;
+
+/**
+ * Hook for the live effects session (WebSocket /api/effects/session).
+ *
+ * The clip is uploaded once per blob. Effect changes are sent as small
+ * deltas ("set" for a parameter change on the same chain, "effects" when
+ * effects are added, removed or reordered) together with the playhead, and
+ * the server streams back re-rendered PCM16 blocks starting there.
+ *
+ * While `playing` is true, each block is played through Web Audio as it
+ * arrives, from the playhead onwards, so a change is heard straight away
+ * without restarting playback; `auditioning` is true while that happens and
+ * callers should mute their own player. When a render completes, the
+ * assembled clip is handed to onRendered as a WAV blob.
+ *
+ * `live` is false until the server has loaded the clip, and again after the
+ * socket closes, so callers can fall back to /api/apply-effects.
+ */
+export function useEffectsSession(wsUrl, clip, effects, playheadRef, playing, onRendered) {
+    const [live, setLive] = useState(false);
+    const [auditioning, setAuditioning] = useState(false);
+
+    const socketRef = useRef(null);
+    const clipInfoRef = useRef(null);
+    const channelsRef = useRef([]);
+    const renderIdRef = useRef(0);
+    const sentEffectsRef = useRef(null);
+    const onRenderedRef = useRef(onRendered);
+    const playingRef = useRef(playing);
+    const audioContextRef = useRef(null);
+    const sourcesRef = useRef(new Set());
+    // Maps the current render onto the audio clock: { id, startFrame, startTime }
+    const scheduleRef = useRef(null);
+
+    useEffect(() => { onRenderedRef.current = onRendered; }, [onRendered]);
+
+    const stopPlayback = () => {
+        for (const source of sourcesRef.current) {
+            source.onended = null;
+            source.stop();
+        }
+        sourcesRef.current.clear();
+        scheduleRef.current = null;
+        setAuditioning(false);
+    };
+
+    useEffect(() => {
+        playingRef.current = playing;
+        if (!playing) stopPlayback();
+    }, [playing]);
+
+    useEffect(() => () => {
+        stopPlayback();
+        audioContextRef.current?.close();
+        audioContextRef.current = null;
+    }, []);
+
+    const startPlayback = (id, position) => {
+        stopPlayback();
+        const info = clipInfoRef.current;
+        if (!playingRef.current || !info) return;
+        if (!audioContextRef.current) audioContextRef.current = new AudioContext();
+        const context = audioContextRef.current;
+        context.resume();
+        scheduleRef.current = {
+            id,
+            startFrame: Math.round(position * info.sampleRate),
+            startTime: context.currentTime + PLAYBACK_LEAD_SECONDS,
+        };
+        setAuditioning(true);
+    };
+
+    const playBlock = (offset, frames) => {
+        const schedule = scheduleRef.current;
+        const info = clipInfoRef.current;
+        if (!schedule || schedule.id !== renderIdRef.current || !info) return;
+        const context = audioContextRef.current;
+        const buffer = context.createBuffer(info.channels, frames, info.sampleRate);
+        channelsRef.current.forEach((channel, c) => buffer.copyToChannel(channel.subarray(offset, offset + frames), c));
+        const when = schedule.startTime + (offset - schedule.startFrame) / info.sampleRate;
+        // A block that arrives late loses the part that is already past, keeping later blocks in time
+        const skip = Math.max(0, context.currentTime - when);
+        if (skip >= buffer.duration) return;
+        const source = context.createBufferSource();
+        source.buffer = buffer;
+        source.connect(context.destination);
+        source.onended = () => sourcesRef.current.delete(source);
+        source.start(when + skip, skip);
+        sourcesRef.current.add(source);
+    };
+
+    // One socket per clip; the server keeps the decoded clip and live board
+    useEffect(() => {
+        if (!wsUrl || !clip) return;
+        const socket = new WebSocket(wsUrl);
+        socket.binaryType = 'arraybuffer';
+        socketRef.current = socket;
+        sentEffectsRef.current = null;
+
+        socket.onopen = async () => {
+            socket.send(JSON.stringify({ type: 'effects', effects }));
+            sentEffectsRef.current = effects;
+            socket.send(await clip.arrayBuffer());
+        };
+
+        socket.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                const info = clipInfoRef.current;
+                if (!info) return;
+                // uint32 frame offset, then interleaved PCM16
+                const offset = new DataView(event.data).getUint32(0, true);
+                const samples = new Int16Array(event.data, 4);
+                const channels = channelsRef.current;
+                const frames = samples.length / info.channels;
+                for (let i = 0; i < frames; i++) {
+                    for (let c = 0; c < info.channels; c++) {
+                        channels[c][offset + i] = samples[i * info.channels + c] / 32768;
+                    }
+                }
+                playBlock(offset, frames);
+                return;
+            }
+            const message = JSON.parse(event.data);
+            if (message.type === 'ready') {
+                clipInfoRef.current = { sampleRate: message.sample_rate, channels: message.channels };
+                channelsRef.current = Array.from({ length: message.channels }, () => new Float32Array(message.frames));
+                setLive(true);
+            } else if (message.type === 'render') {
+                renderIdRef.current = message.id;
+                startPlayback(message.id, message.position);
+            } else if (message.type === 'done' && message.id === renderIdRef.current) {
+                onRenderedRef.current(encodeWav(channelsRef.current, clipInfoRef.current.sampleRate));
+            } else if (message.type === 'error') {
+                console.error('Effects session:', message.detail);
+            }
+        };
+
+        socket.onclose = () => {
+            if (socketRef.current === socket) {
+                socketRef.current = null;
+                setLive(false);
+            }
+        };
+
+        return () => {
+            socketRef.current = null;
+            clipInfoRef.current = null;
+            stopPlayback();
+            setLive(false);
+            socket.close();
+        };
+    }, [wsUrl, clip]);
+
+    // Send effect changes as deltas against what the server already has
+    useEffect(() => {
+        const socket = socketRef.current;
+        const sent = sentEffectsRef.current;
+        if (!live || !socket || socket.readyState !== WebSocket.OPEN || !sent || sent === effects) return;
+        const position = playheadRef?.current || 0;
+        const sameChain = JSON.stringify(Object.keys(sent)) === JSON.stringify(Object.keys(effects));
+        const changed = Object.keys(effects).filter(id => JSON.stringify(sent[id]) !== JSON.stringify(effects[id]));
+        if (sameChain && changed.length === 1) {
+            const id = changed[0];
+            const params = Object.fromEntries(
+                Object.entries(effects[id]).filter(([p, v]) => sent[id][p] !== v)
+            );
+            socket.send(JSON.stringify({ type: 'set', effect: id, params, position }));
+        } else {
+            socket.send(JSON.stringify({ type: 'effects', effects, position }));
+        }
+        sentEffectsRef.current = effects;
+    }, [live, effects, playheadRef]);
+
+    return { live, auditioning };
+}
+
+function encodeWav(channels, sampleRate) {
+    const numChannels = channels.length;
+    const frames = channels[0]?.length || 0;
+    const dataSize = frames * numChannels * 2;
+    const buffer = new ArrayBuffer(44 + dataSize);
+    const view = new DataView(buffer);
+    const writeString = (pos, s) => { for (let i = 0; i < s.length; i++) view.setUint8(pos + i, s.charCodeAt(i)); };
+
+    writeString(0, 'RIFF');
+    view.setUint32(4, 36 + dataSize, true);
+    writeString(8, 'WAVE');
+    writeString(12, 'fmt ');
+    view.setUint32(16, 16, true);
+    view.setUint16(20, 1, true);
+    view.setUint16(22, numChannels, true);
+    view.setUint32(24, sampleRate, true);
+    view.setUint32(28, sampleRate * numChannels * 2, true);
+    view.setUint16(32, numChannels * 2, true);
+    view.setUint16(34, 16, true);
+    writeString(36, 'data');
+    view.setUint32(40, dataSize, true);
+
+    let pos = 44;
+    for (let i = 0; i < frames; i++) {
+        for (let c = 0; c < numChannels; c++) {
+            const s = Math.max(-1, Math.min(1, channels[c][i]));
+            view.setInt16(pos, s < 0 ? s * 0x8000 : s * 0x7fff, true);
+            pos += 2;
+        }
+    }
+    return new Blob([buffer], { type: 'audio/wav' });
+}